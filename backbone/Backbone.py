@@ -0,0 +1,309 @@
+import os
+from fasta.Fasta import read_fasta
+from motif.Motif import PROMOTERS
+
+# Reference backbones, one fasta record per promoter. Each runs from the
+# anchor after the insert round the plasmid to the anchor before it, so
+# it lines up with backbone() whatever the origin of the plasmid file.
+REFERENCE_FILE = os.path.join(os.path.dirname(__file__), 'references.fa')
+# Start of the Sh ble (Zeocin resistance) coding sequence
+ZEOCIN_START = 'ATGGCCAAGTTGACCAGTGCCGTTCC'
+# Reference k-mers of SEED bases, every SEED_STEP bases, are looked for
+# in the plasmid within SEED_WINDOW bases of where they are expected
+SEED = 16
+SEED_STEP = 64
+SEED_WINDOW = 64
+# A backbone with fewer of the seeds than this is not compared
+MIN_SEEDS = 0.5
+# Extra diagonals on either side of the band
+BAND = 16
+# Stretches of equal length with at most one mismatch in this many
+# bases are not aligned; the mismatches are taken as substitutions
+SUBSTITUTION_SHARE = 10
+# Changes listed in the summary; the counts include all of them
+MAX_LISTED = 10
+# Longest indel whose bases are listed
+MAX_SHOWN = 10
+# Score below any reachable alignment score
+NEG = -(1 << 30)
+INTACT = ('intact', 0, 0, '')
+UNKNOWN = ('unknown', 0, 0, '')
+
+_references = {}
+
+
+class Reference():
+    '''
+    A reference backbone with its seeds and the regions used to name
+    changes: the promoter, the Zeocin marker and the rest of the
+    backbone.
+    '''
+    def __init__(self, promoter, sequence):
+        from translation.Translation import translate_to_stop
+        self.sequence = sequence
+        self.seeds = [(position, sequence[position:position + SEED])
+                      for position in range(0, len(sequence) - SEED + 1, SEED_STEP)]
+        self.regions = []
+        start = sequence.find(PROMOTERS[promoter][0])
+        if start != -1:
+            self.regions.append((start, len(sequence), 'promoter'))
+        start = sequence.find(ZEOCIN_START)
+        if start != -1:
+            length = 3 * len(translate_to_stop(sequence[start:]))
+            self.regions.append((start, start + length, 'Zeocin marker'))
+
+    def region(self, position):
+        '''
+        Returns the name of the region of a reference position.
+        '''
+        for start, end, name in self.regions:
+            if start <= position < end:
+                return name
+        return 'backbone'
+
+
+def reference(promoter):
+    '''
+    Returns the Reference for promoter, or None if there is none. The
+    reference file is read on first use.
+    '''
+    if not _references:
+        for header, sequence in read_fasta(REFERENCE_FILE):
+            name = header.split()[0]
+            _references[name] = Reference(name, sequence.upper())
+    return _references.get(promoter)
+
+
+def backbone(DNA, coding_region):
+    '''
+    Returns the part of circular DNA outside the coding region (start,
+    end), from the end of the region round to its start.
+    '''
+    start, end = coding_region
+    return DNA[end:] + DNA[:start]
+
+
+def find_seeds(query, oReference):
+    '''
+    Returns the (reference position, query position) of each seed found
+    in query, in order along both. A seed is looked for near where the
+    previous one puts it, then, once some seed has been found, anywhere
+    further on if it is unique there. Stops early once too many seeds
+    are missing for the backbone to be compared, so an unrelated
+    backbone is given up on quickly.
+    '''
+    found = []
+    drift = 0
+    last = 0
+    allowed_misses = len(oReference.seeds) * (1 - MIN_SEEDS)
+    misses = 0
+    for position, kmer in oReference.seeds:
+        expected = position + drift
+        hit = query.find(kmer, max(last, expected - SEED_WINDOW),
+                         expected + SEED_WINDOW + SEED)
+        if hit == -1 and found:
+            hit = query.find(kmer, last)
+            if hit != -1 and query.find(kmer, hit + 1) != -1:
+                hit = -1
+        if hit == -1:
+            misses += 1
+            if misses > allowed_misses:
+                break
+            continue
+        found.append((position, hit))
+        drift = hit - position
+        last = hit + SEED
+    return found
+
+
+def band_scores(rows, columns):
+    '''
+    Returns (scores, lows) for a global alignment of the sequences rows
+    and columns with unit costs for mismatches and gaps, within a band
+    around the diagonal. Only the band is kept: scores[i, k] is the
+    score of rows[:i] against columns[:lows[i] + k], NEG outside the
+    band. Rows are computed whole with NumPy; gaps along a row come from
+    a running maximum.
+    '''
+    import numpy as np
+    n, m = len(rows), len(columns)
+    row_bases = np.frombuffer(rows.encode('ascii', 'replace'), dtype=np.uint8)
+    # Column j is scored against column_bases[j], the base before it
+    column_bases = np.frombuffer(b' ' + columns.encode('ascii', 'replace'), dtype=np.uint8)
+    band = abs(n - m) + BAND
+    width = min(2 * band, m) + 1
+    # Rows are stored from index 1, with NEG on either side, so the
+    # previous row can be read as slices: one cell to the left for the
+    # diagonal, and past its end where the band moves right
+    step = -(-m // n) if n else 0
+    scores = np.full((n + 1, width + step + 2), NEG, dtype=np.int32)
+    lows = np.zeros(n + 1, dtype=np.intp)
+    first = min(m, band) + 1
+    scores[0, 1:first + 1] = -np.arange(first)
+    for i in range(1, n + 1):
+        centre = i * m // n
+        low, high = max(0, centre - band), min(m, centre + band)
+        lows[i] = low
+        shift = low - lows[i - 1]
+        length = high - low + 1
+        previous = scores[i - 1]
+        diagonal = previous[shift:shift + length] - (column_bases[low:high + 1] != row_bases[i - 1])
+        best = np.maximum(previous[shift + 1:shift + 1 + length] - 1, diagonal)
+        columns_here = np.arange(low, high + 1, dtype=np.int32)
+        scores[i, 1:length + 1] = np.maximum.accumulate(best + columns_here) - columns_here
+    return scores[:, 1:width + 1], lows
+
+
+def align(reference_part, query_part):
+    '''
+    Globally aligns two short sequences with unit costs for mismatches
+    and gaps, within a band around the diagonal (see band_scores). The
+    rows follow the shorter sequence, so a large insertion or deletion
+    costs few rows. Returns the changes from reference to query as
+    (reference offset, kind, reference bases, query bases) tuples.
+    '''
+    swapped = len(query_part) < len(reference_part)
+    rows, columns = (query_part, reference_part) if swapped else (reference_part, query_part)
+    scores, lows = band_scores(rows, columns)
+    width = scores.shape[1]
+
+    def score(i, j):
+        k = j - lows[i]
+        return int(scores[i, k]) if 0 <= k < width else NEG
+
+    # Trace back from the end. Matches and substitutions are preferred,
+    # except that a gap is extended while it can be, so an indel is
+    # reported as one run rather than scattered single bases. A step
+    # 'up' uses a base of rows only, 'left' a base of columns only.
+    changes = []
+    i, j = len(rows), len(columns)
+    previous = 'diagonal'
+    while i > 0 or j > 0:
+        here = score(i, j)
+        up = i > 0 and here == score(i - 1, j) - 1
+        left = j > 0 and here == score(i, j - 1) - 1
+        if previous == 'up' and up:
+            step = 'up'
+        elif previous == 'left' and left:
+            step = 'left'
+        elif i > 0 and j > 0 and here == score(i - 1, j - 1) - int(rows[i - 1] != columns[j - 1]):
+            step = 'diagonal'
+        else:
+            step = 'up' if up else 'left'
+        if step == 'diagonal':
+            r, q = (j - 1, i - 1) if swapped else (i - 1, j - 1)
+            if reference_part[r] != query_part[q]:
+                changes.append((r, 'sub', reference_part[r], query_part[q]))
+            i, j = i - 1, j - 1
+        elif (step == 'up') != swapped:
+            # A reference base with no query base
+            r = j - 1 if swapped else i - 1
+            changes.append((r, 'del', reference_part[r], ''))
+        else:
+            # A query base inserted before reference position r
+            r, q = (j, i - 1) if swapped else (i, j - 1)
+            changes.append((r, 'ins', '', query_part[q]))
+        if step == 'up':
+            i -= 1
+        elif step == 'left':
+            j -= 1
+        previous = step
+    changes.reverse()
+    return changes
+
+
+def segment_changes(reference_part, query_part):
+    '''
+    Returns the changes from reference_part to query_part, as align
+    does. Stretches of equal length with few mismatches are taken as
+    substitutions only; otherwise the common start and end are trimmed
+    and only the rest is aligned.
+    '''
+    import numpy as np
+    n, m = len(reference_part), len(query_part)
+    ref = np.frombuffer(reference_part.encode('ascii', 'replace'), dtype=np.uint8)
+    query = np.frombuffer(query_part.encode('ascii', 'replace'), dtype=np.uint8)
+    shorter = min(n, m)
+    differs = ref[:shorter] != query[:shorter]
+    mismatches = np.flatnonzero(differs)
+    if n == m and len(mismatches) <= max(1, n // SUBSTITUTION_SHARE):
+        return [(int(position), 'sub', reference_part[position], query_part[position])
+                for position in mismatches.tolist()]
+    prefix = int(mismatches[0]) if len(mismatches) else shorter
+    tail_differs = ref[n - shorter + prefix:][::-1] != query[m - shorter + prefix:][::-1]
+    suffix = int(np.argmax(tail_differs)) if tail_differs.any() else len(tail_differs)
+    return [(prefix + offset, kind, ref_bases, query_bases)
+            for offset, kind, ref_bases, query_bases
+            in align(reference_part[prefix:n - suffix], query_part[prefix:m - suffix])]
+
+
+def merge_changes(changes):
+    '''
+    Joins runs of adjacent insertions or deletions into single changes.
+    '''
+    merged = []
+    for position, kind, ref_bases, query_bases in changes:
+        if merged and kind != 'sub' and merged[-1][1] == kind:
+            last_position, _, last_ref, last_query = merged[-1]
+            if (kind == 'del' and last_position + len(last_ref) == position) or \
+                    (kind == 'ins' and last_position == position):
+                merged[-1] = (last_position, kind, last_ref + ref_bases, last_query + query_bases)
+                continue
+        merged.append((position, kind, ref_bases, query_bases))
+    return merged
+
+
+def describe(change, oReference):
+    '''
+    Returns a change as text, with 1-based reference positions, e.g.
+    'promoter:512T>C', 'Zeocin marker:88delG' or 'backbone:1204_1205insAT'.
+    Indels longer than MAX_SHOWN bases are given as a range or length.
+    '''
+    position, kind, ref_bases, query_bases = change
+    region = oReference.region(position)
+    if kind == 'sub':
+        return f'{region}:{position + 1}{ref_bases}>{query_bases}'
+    if kind == 'del':
+        if len(ref_bases) > MAX_SHOWN:
+            return f'{region}:{position + 1}_{position + len(ref_bases)}del'
+        return f'{region}:{position + 1}del{ref_bases}'
+    if len(query_bases) > MAX_SHOWN:
+        return f'{region}:{position}_{position + 1}ins{len(query_bases)}bp'
+    return f'{region}:{position}_{position + 1}ins{query_bases}'
+
+
+def check_backbone(DNA, promoter, coding_region):
+    '''
+    Compares the backbone of DNA outside coding_region with the
+    reference for promoter. Returns (status, substituted bases, inserted
+    and deleted bases, changes) where status is 'intact', 'changed' or
+    'unknown' (no reference, or too few seeds found to compare). Only
+    the stretches between seeds that differ from the reference are
+    aligned, so an intact backbone costs one string comparison.
+    '''
+    oReference = reference(promoter)
+    if oReference is None or coding_region is None:
+        return UNKNOWN
+    query = backbone(DNA, coding_region).upper()
+    if query == oReference.sequence:
+        return INTACT
+    seeds = find_seeds(query, oReference)
+    if len(seeds) < MIN_SEEDS * len(oReference.seeds):
+        return UNKNOWN
+    changes = []
+    previous = (0, 0)
+    for anchor in seeds + [(len(oReference.sequence), len(query))]:
+        reference_part = oReference.sequence[previous[0]:anchor[0]]
+        query_part = query[previous[1]:anchor[1]]
+        if reference_part != query_part:
+            changes.extend((previous[0] + offset, kind, ref_bases, query_bases)
+                           for offset, kind, ref_bases, query_bases
+                           in segment_changes(reference_part, query_part))
+        previous = anchor
+    changes = merge_changes(changes)
+    substitutions = sum(1 for change in changes if change[1] == 'sub')
+    indels = sum(len(change[2]) + len(change[3]) for change in changes if change[1] != 'sub')
+    listed = [describe(change, oReference) for change in changes[:MAX_LISTED]]
+    if len(changes) > MAX_LISTED:
+        listed.append(f'and {len(changes) - MAX_LISTED} more')
+    return ('changed' if changes else 'intact', substitutions, indels, '; '.join(listed))
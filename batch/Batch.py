@@ -0,0 +1,248 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+# Least time between two 'analyzed' progress lines, in seconds
+PROGRESS_INTERVAL = 1.0
+
+
+class Progress():
+    '''
+    Reports the progress of a headless run to stream, as one JSON
+    object per line ('json') or as plain text ('text'), or not at all
+    ('none'). Called as progress(event, **fields). 'analyzed' events
+    come once per file, so they are thinned to one per
+    PROGRESS_INTERVAL, always keeping the last.
+    '''
+    def __init__(self, mode='text', stream=sys.stderr):
+        self.mode = mode
+        self.stream = stream
+        self.start = time.perf_counter()
+        self.last_analyzed = None
+
+    def __call__(self, event, **fields):
+        if self.mode == 'none':
+            return
+        now = time.perf_counter()
+        if event == 'analyzed' and fields['done'] != fields['total']:
+            if self.last_analyzed is not None and now - self.last_analyzed < PROGRESS_INTERVAL:
+                return
+            self.last_analyzed = now
+        elapsed = round(now - self.start, 3)
+        if self.mode == 'json':
+            line = json.dumps({'event': event, 'elapsed': elapsed, **fields})
+        else:
+            details = ' '.join(f'{name}={value}' for name, value in fields.items())
+            line = f'[{elapsed:8.2f}s] {event} {details}'.rstrip()
+        print(line, file=self.stream, flush=True)
+
+
+def summarize(args):
+    '''
+    Analyzes every folder in args.directory without prompting, writes
+    the summary to args.out and, if asked, the paginated table and the
+    library index. Returns the exit status.
+    '''
+    from manager.Manager import Manager
+    from profiling.Profiling import PROFILER, enable
+    if args.profile:
+        enable()
+    progress = Progress(args.progress)
+    if not os.path.isdir(args.directory):
+        progress('error', message=f'{args.directory} is not a folder')
+        return 2
+    # Manager joins root and folder names directly
+    root = os.path.join(args.directory, '')
+    if args.stream:
+        return stream(args, root, progress)
+    plasmid_manager = Manager()
+    plasmid_manager.create_all_objects(root, workers=max(1, args.workers),
+                                       cache=not args.no_cache, interactive=False,
+                                       progress=progress)
+    plasmid_manager.prepare_for_pandas(plasmid_manager.plasmids_list)
+    try:
+        plasmid_manager.summary.write(args.out)
+        progress('wrote', file=args.out, rows=len(plasmid_manager.summary))
+        if args.table:
+            index_file = plasmid_manager.write_table(args.table)
+            progress('wrote', file=index_file, rows=len(plasmid_manager.summary))
+    except (ValueError, ImportError, OSError) as error:
+        progress('error', message=str(error))
+        return 1
+    if args.index and plasmid_manager.update_library_index(root):
+        progress('indexed', rows=len(plasmid_manager.plasmids_list))
+    if args.profile:
+        PROFILER.write_json(args.profile)
+        progress('wrote', file=args.profile)
+    progress('done', plasmids=len(plasmid_manager.plasmids_list))
+    return 0
+
+
+def stream(args, root, progress):
+    '''
+    summarize with --stream: rows are written as the folders are
+    analyzed, in constant memory. Returns the exit status.
+    '''
+    from pipeline.Pipeline import stream_summary, BATCH_SIZE
+    from profiling.Profiling import PROFILER
+    if args.table or args.index:
+        progress('error', message='--table and --index need the whole library; '
+                                  'leave out --stream to use them')
+        return 2
+    try:
+        rows = stream_summary(root, args.out, workers=max(1, args.workers),
+                              batch_size=args.batch_size or BATCH_SIZE, progress=progress)
+    except (ValueError, ImportError, OSError) as error:
+        progress('error', message=str(error))
+        return 1
+    progress('wrote', file=args.out, rows=rows)
+    if args.profile:
+        PROFILER.write_json(args.profile)
+        progress('wrote', file=args.profile)
+    progress('done', plasmids=rows)
+    return 0
+
+
+def plan_shards(args):
+    '''
+    Writes the shard manifest for args.directory. Returns the exit
+    status.
+    '''
+    from shard.Shard import plan
+    progress = Progress(args.progress)
+    try:
+        manifest = plan(args.directory, args.shards, args.manifest)
+    except (ValueError, OSError) as error:
+        progress('error', message=str(error))
+        return 1
+    sizes = [0] * manifest['shards']
+    for entry in manifest['folders'].values():
+        sizes[entry['shard']] += 1
+    progress('planned', file=args.manifest, folders=len(manifest['folders']), shards=sizes)
+    return 0
+
+
+def analyze_shard(args):
+    '''
+    Analyzes one shard of a manifest into a partial summary. Returns the
+    exit status.
+    '''
+    from shard.Shard import run_shard
+    progress = Progress(args.progress)
+    try:
+        folders = run_shard(args.manifest, args.shard, args.out, root=args.root,
+                            workers=max(1, args.workers), progress=progress)
+    except (ValueError, OSError) as error:
+        progress('error', message=str(error))
+        return 1
+    progress('done', shard=args.shard, folders=folders, file=args.out)
+    return 0
+
+
+def merge_shards(args):
+    '''
+    Merges the partial summaries of every shard and writes the summary
+    and, if asked, the tables. Returns the exit status.
+    '''
+    from manager.Manager import Manager
+    progress = Progress(args.progress)
+    plasmid_manager = Manager()
+    try:
+        plasmid_manager.merge_shards(args.manifest, args.partials)
+        if args.out:
+            plasmid_manager.summary.write(args.out)
+            progress('wrote', file=args.out, rows=len(plasmid_manager.summary))
+        if args.html:
+            plasmid_manager.create_df()
+            plasmid_manager.create_table(show=False)
+            plasmid_manager.table.write_raw_html(args.html, make_page=True)
+            progress('wrote', file=args.html, rows=len(plasmid_manager.summary))
+        if args.table:
+            index_file = plasmid_manager.write_table(args.table)
+            progress('wrote', file=index_file, rows=len(plasmid_manager.summary))
+    except (ValueError, ImportError, OSError) as error:
+        progress('error', message=str(error))
+        return 1
+    progress('done', plasmids=len(plasmid_manager.summary))
+    return 0
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='main.py', description='Headless analysis of an expression plasmid library.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    command = commands.add_parser(
+        'summarize', help='analyze every plasmid folder and write the summary',
+        description='Analyzes every plasmid folder in DIR and writes the summary, '
+                    'without prompts. Folders with several fasta files use the one '
+                    'named after the folder, then .fa over .fasta, then the first by name.')
+    command.add_argument('directory', metavar='DIR', help='library folder, e.g. data/')
+    command.add_argument('--out', required=True,
+                         help='summary file (.csv, .parquet or .arrow)')
+    command.add_argument('--table', metavar='FOLDER',
+                         help='also write the paginated html table to FOLDER')
+    command.add_argument('--index', action='store_true',
+                         help='also update the library index used by menu option 10')
+    command.add_argument('--workers', type=int, default=os.cpu_count(),
+                         help='worker processes (default: one per CPU; 1 runs in this process)')
+    command.add_argument('--no-cache', action='store_true',
+                         help='analyze every file again instead of using the cache')
+    command.add_argument('--stream', action='store_true',
+                         help='write rows as they are produced, in constant memory, '
+                              'without the cache')
+    command.add_argument('--batch-size', type=int,
+                         help='plasmids per streamed batch (default: 1000)')
+    command.add_argument('--progress', choices=('text', 'json', 'none'), default='text',
+                         help='progress on stderr as text, JSON lines or not at all')
+    command.add_argument('--profile', metavar='FILE',
+                         help='time each analysis stage and write the timings to FILE')
+    command = commands.add_parser(
+        'plan', help='assign the plasmid folders to shards for several hosts',
+        description='Writes a manifest that assigns each plasmid folder in DIR to one '
+                    'of N shards by a stable hash of its name.')
+    command.add_argument('directory', metavar='DIR', help='library folder, e.g. data/')
+    command.add_argument('--shards', type=int, required=True, help='number of shards')
+    command.add_argument('--manifest', required=True, help='manifest file to write')
+    command.add_argument('--progress', choices=('text', 'json', 'none'), default='text')
+    command = commands.add_parser(
+        'shard', help='analyze one shard into a partial summary',
+        description='Analyzes the folders of one shard of the manifest and writes '
+                    'its partial summary (JSON).')
+    command.add_argument('manifest', help='manifest written by plan')
+    command.add_argument('--shard', type=int, required=True, help='shard number, from 0')
+    command.add_argument('--out', required=True, help='partial summary file to write')
+    command.add_argument('--root', help='library folder on this host, if not the planned one')
+    command.add_argument('--workers', type=int, default=os.cpu_count(),
+                         help='worker processes (default: one per CPU)')
+    command.add_argument('--progress', choices=('text', 'json', 'none'), default='text')
+    command = commands.add_parser(
+        'merge', help='combine the partial summaries of every shard',
+        description='Checks that the partial summaries cover every folder of the '
+                    'manifest exactly once and writes the combined summary.')
+    command.add_argument('manifest', help='manifest written by plan')
+    command.add_argument('partials', nargs='+', help='partial summaries written by shard')
+    command.add_argument('--out', help='summary file (.csv, .parquet or .arrow)')
+    command.add_argument('--html', metavar='FILE',
+                         help='write the great-tables table, as menu option 2 shows it, to FILE')
+    command.add_argument('--table', metavar='FOLDER',
+                         help='write the paginated html table to FOLDER')
+    command.add_argument('--progress', choices=('text', 'json', 'none'), default='text')
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    '''
+    Runs the headless command in argv (without the program name) and
+    returns its exit status.
+    '''
+    args = parse_args(argv)
+    if args.command == 'summarize':
+        return summarize(args)
+    if args.command == 'plan':
+        return plan_shards(args)
+    if args.command == 'shard':
+        return analyze_shard(args)
+    if args.command == 'merge':
+        return merge_shards(args)
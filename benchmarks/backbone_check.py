@@ -0,0 +1,152 @@
+'''
+Checks backbone.Backbone.check_backbone on the bundled reference
+backbones with known changes planted in them: substitutions, short
+insertions and deletions, large deletions and insertions, a long
+divergent stretch (substitutions every few bases, so its seeds are
+missed and it is aligned as one segment) with an indel in it, and a mix
+of changes far enough apart that there is only one best alignment. Each
+mutant must give exactly the planted substitution and indel counts, and
+each indel must be reported as a single change. Exits with status 1 if
+any mutant differs.
+
+    python benchmarks/backbone_check.py --mutants 100 --seed 0
+
+Peak memory is the largest traced allocation during one check.
+'''
+import os
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from backbone.Backbone import reference, check_backbone
+
+PROMOTERS = ['aox1', 'gap']
+# Stand-in for the insert; check_backbone only looks outside it
+INSERT = 'ATG' + 'GCT' * 100 + 'TAA'
+# Least distance between two changes of a mixed mutant
+SPACING = 40
+# Length of the divergent stretch, and the least distance between its
+# substitutions
+DIVERGENT = 1100
+DIVERGENT_SPACING = 8
+KINDS = ['substitutions', 'short indel', 'large deletion', 'large insertion',
+         'divergent stretch', 'mixed']
+
+
+def substitute(rng, base):
+    '''
+    Returns a base other than base.
+    '''
+    return rng.choice([other for other in 'ACGT' if other != base])
+
+
+def random_bases(rng, length):
+    return ''.join(rng.choice('ACGT') for _ in range(length))
+
+
+def plant(rng, sequence, kind):
+    '''
+    Returns (mutant, substitutions, indel bases, indels) for a random
+    mutant of sequence of the given kind. Changes are applied from the
+    end, so earlier positions stay valid.
+    '''
+    length = len(sequence)
+    if kind == 'substitutions':
+        count = rng.randint(1, 20)
+        positions = sorted(rng.sample(range(0, length, SPACING), count))
+        changes = [(position, 'sub', 1) for position in positions]
+    elif kind == 'short indel':
+        changes = [(rng.randrange(SPACING, length - SPACING), rng.choice(['del', 'ins']),
+                    rng.randint(1, 10))]
+    elif kind == 'large deletion':
+        size = rng.randint(100, 1000)
+        changes = [(rng.randrange(SPACING, length - size - SPACING), 'del', size)]
+    elif kind == 'large insertion':
+        changes = [(rng.randrange(SPACING, length - SPACING), 'ins', rng.randint(100, 1000))]
+    elif kind == 'divergent stretch':
+        start = rng.randrange(SPACING, length - DIVERGENT - SPACING)
+        changes = [(position, 'sub', 1)
+                   for position in range(start, start + DIVERGENT, DIVERGENT_SPACING)]
+        # The indel has no substitutions near it, which it could
+        # otherwise be shifted to absorb
+        middle = start + DIVERGENT // 2
+        changes = [change for change in changes if abs(change[0] - middle) > 2 * DIVERGENT_SPACING]
+        changes.append((middle, rng.choice(['del', 'ins']), rng.randint(1, 5)))
+        changes.sort()
+    else:
+        changes = []
+        position = rng.randrange(SPACING)
+        while position < length - 2 * SPACING:
+            kind = rng.choice(['sub', 'sub', 'del', 'ins'])
+            size = 1 if kind == 'sub' else rng.randint(1, 10)
+            changes.append((position, kind, size))
+            position += size + SPACING + rng.randrange(4 * SPACING)
+    mutant = sequence
+    for position, kind, size in reversed(changes):
+        if kind == 'sub':
+            mutant = mutant[:position] + substitute(rng, mutant[position]) + mutant[position + 1:]
+        elif kind == 'del':
+            mutant = mutant[:position] + mutant[position + size:]
+        else:
+            mutant = mutant[:position] + random_bases(rng, size) + mutant[position:]
+    substitutions = sum(1 for change in changes if change[1] == 'sub')
+    indel_bases = sum(change[2] for change in changes if change[1] != 'sub')
+    return mutant, substitutions, indel_bases, len(changes) - substitutions
+
+
+def listed_indels(listed):
+    '''
+    Returns the number of indels in a changes column, or None if the
+    list was cut short.
+    '''
+    if ' more' in listed:
+        return None
+    return sum(1 for change in listed.split('; ') if 'del' in change or 'ins' in change)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check check_backbone on planted mutants.')
+    parser.add_argument('--mutants', type=int, default=100,
+                        help='mutants of each kind for each reference')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    failures = 0
+    for promoter in PROMOTERS:
+        sequence = reference(promoter).sequence
+        coding_region = (0, len(INSERT))
+        for kind in KINDS:
+            wrong = 0
+            elapsed = 0.0
+            peak = 0
+            for _ in range(args.mutants):
+                mutant, substitutions, indel_bases, indels = plant(rng, sequence, kind)
+                tracemalloc.start()
+                start = time.perf_counter()
+                status, found_subs, found_indel_bases, listed = check_backbone(
+                    INSERT + mutant, promoter, coding_region)
+                elapsed += time.perf_counter() - start
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+                found_indels = listed_indels(listed)
+                if (status, found_subs, found_indel_bases) != ('changed', substitutions, indel_bases) \
+                        or found_indels not in (None, indels):
+                    wrong += 1
+                    if failures + wrong <= 5:
+                        print(f'{promoter} {kind}: planted {substitutions} subs, {indel_bases} '
+                              f'indel bases in {indels} indels; got {status}, {found_subs}, '
+                              f'{found_indel_bases}: {listed}')
+            failures += wrong
+            print(f'{promoter:<5} {kind:<17} {args.mutants - wrong:>4}/{args.mutants} exact  '
+                  f'{elapsed / args.mutants * 1000:7.2f} ms/plasmid  '
+                  f'peak {peak / 1024:8.1f} KB')
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
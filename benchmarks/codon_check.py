@@ -0,0 +1,135 @@
+'''
+Checks codon.Codon.codon_usage against a plain per-codon reference on
+random coding sequences, and times it. The sequences mix lengths that
+are not a multiple of three, early and late stops, N and lower-case
+bases, and runs of rare codons at the ends of frames, which is where
+the vectorized frame and cluster logic is easiest to get wrong. Exits
+with status 1 if any value differs.
+
+    python benchmarks/codon_check.py --sequences 3000 --seed 0
+'''
+import os
+import sys
+import math
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from translation.Translation import GENETIC_CODE
+from codon.Codon import (KPHAFFII_USAGE, CODONS, RARE_W, CLUSTER_WINDOW, CLUSTER_RARE,
+                         codon_usage)
+
+# Largest difference allowed between the CAI and GC values
+TOLERANCE = 1e-9
+
+
+def reference_weights():
+    '''
+    Returns the relative adaptiveness of each codon, as a dict.
+    '''
+    most_used = {}
+    for codon, frequency in KPHAFFII_USAGE.items():
+        amino_acid = GENETIC_CODE[codon]
+        most_used[amino_acid] = max(most_used.get(amino_acid, 0.0), frequency)
+    return {codon: frequency / most_used[GENETIC_CODE[codon]]
+            for codon, frequency in KPHAFFII_USAGE.items()}
+
+
+def reference_usage(sequence, weights):
+    '''
+    Returns (cai, gc, rare codons, rare clusters) of one sequence, one
+    codon at a time.
+    '''
+    sequence = sequence.upper().replace('U', 'T')
+    frame = []
+    for start in range(0, len(sequence) - 2, 3):
+        codon = sequence[start:start + 3]
+        if GENETIC_CODE.get(codon) == '*':
+            break
+        frame.append(codon)
+    known = [codon for codon in frame if codon in weights]
+    synonymous = [codon for codon in known if GENETIC_CODE[codon] not in 'MW']
+    rare = [codon in weights and weights[codon] < RARE_W for codon in frame]
+    cai = (math.exp(sum(math.log(weights[codon]) for codon in synonymous) / len(synonymous))
+           if synonymous else math.nan)
+    gc = (100 * sum(codon.count('G') + codon.count('C') for codon in known) / (3 * len(known))
+          if known else math.nan)
+    clusters = 0
+    previous_hot = False
+    for start in range(len(frame) - CLUSTER_WINDOW + 1):
+        hot = sum(rare[start:start + CLUSTER_WINDOW]) >= CLUSTER_RARE
+        clusters += hot and not previous_hot
+        previous_hot = hot
+    return cai, gc, sum(rare), clusters
+
+
+def random_sequence(rng, rare_codons, sense_codons):
+    '''
+    Returns a random coding sequence. Some have stops, N or lower-case
+    bases, a length that is not a multiple of three, rare codons packed
+    at the start or end of the frame, or only rare codons, so that
+    neighbouring frames both have clusters where they meet.
+    '''
+    length = rng.choice([0, 1, 5, 9, 10, 11, 12, 30, rng.randint(13, 400)])
+    rare_share = 1.0 if rng.random() < 0.1 else 0.2
+    codons = [rng.choice(rare_codons) if rng.random() < rare_share else rng.choice(sense_codons)
+              for _ in range(length)]
+    if codons and rng.random() < 0.3:
+        edge = rng.randint(1, min(length, CLUSTER_WINDOW))
+        packed = [rng.choice(rare_codons) for _ in range(edge)]
+        codons = packed + codons[edge:] if rng.random() < 0.5 else codons[:-edge] + packed
+    if codons and rng.random() < 0.3:
+        codons.insert(rng.randrange(len(codons) + 1), rng.choice(['TAA', 'TAG', 'TGA']))
+    if codons and rng.random() < 0.1:
+        idx = rng.randrange(len(codons))
+        codons[idx] = codons[idx][:2] + 'N'
+    sequence = ''.join(codons) + rng.choice(['', 'A', 'GC'])
+    if rng.random() < 0.1:
+        sequence = sequence.lower()
+    return sequence
+
+
+def same(value, expected):
+    '''
+    Returns True if two floats are equal within TOLERANCE, or both NaN.
+    '''
+    if math.isnan(expected):
+        return math.isnan(value)
+    return abs(value - expected) <= TOLERANCE
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check codon_usage against a reference.')
+    parser.add_argument('--sequences', type=int, default=3000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    weights = reference_weights()
+    sense_codons = [codon for codon in CODONS if GENETIC_CODE[codon] != '*']
+    rare_codons = [codon for codon in sense_codons if weights[codon] < RARE_W]
+    sequences = [random_sequence(rng, rare_codons, sense_codons)
+                 for _ in range(args.sequences)]
+
+    start = time.perf_counter()
+    cai, gc, rare, clusters = codon_usage(sequences)
+    elapsed = time.perf_counter() - start
+
+    differences = 0
+    for idx, sequence in enumerate(sequences):
+        expected = reference_usage(sequence, weights)
+        found = (float(cai[idx]), float(gc[idx]), int(rare[idx]), int(clusters[idx]))
+        if not (same(found[0], expected[0]) and same(found[1], expected[1])
+                and found[2:] == expected[2:]):
+            differences += 1
+            if differences <= 5:
+                print(f'sequence {idx} ({sequence[:30]}...): got {found}, expected {expected}')
+    print(f'{len(sequences)} sequences in {elapsed * 1000:.1f} ms; '
+          f'{sum(int(count) for count in clusters)} clusters; {differences} differ')
+    if differences:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
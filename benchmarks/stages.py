@@ -0,0 +1,238 @@
+'''
+Stage-by-stage benchmark on synthetic libraries. Each stage of the
+whole-library analysis is timed on its own, and the output is checked
+against the generator's ground truth.
+
+    python benchmarks/stages.py --sizes 100 1000 10000 --json results.json
+
+Peak RSS is the process high-water mark after the stage, so it only
+ever grows; compare it between runs, not between stages.
+'''
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from synthetic import generate, write_library
+from manager.Manager import Manager, single_fasta_parser
+from motif.Motif import MotifIndex
+from plasmid.Plasmid import Plasmid, NotPichia
+from protein.Protein import Protein
+from blast.Blast import extract_hits
+from composition.Composition import characterize_proteins
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+BLAST_FILES = sorted(glob.glob(os.path.join(ROOT, 'data', '*', '*_blast.xml')))
+STAGES = ['FASTA parse', 'get_promoter', 'get_coding_DNA', 'reorient', 'backbone_check',
+          'secretion_check', 'translation', 'mass', 'pI (Biopython)', 'mass/pI/tag (batch)',
+          'BLAST XML parse', 'DataFrame build', 'table render', 'table pages']
+
+
+def peak_rss_mb():
+    '''
+    Returns the peak resident set size of this process in MB (Linux
+    reports kilobytes).
+    '''
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Timer():
+    '''
+    Records wall time, items and peak RSS for each stage.
+    '''
+    def __init__(self, skip):
+        self.skip = set(skip)
+        self.results = []
+
+    def run(self, name, items, function):
+        '''
+        Calls function() as stage name and returns its result, or None
+        if the stage is skipped.
+        '''
+        if name in self.skip:
+            return None
+        start = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - start
+        self.results.append({'stage': name, 'items': items, 'seconds': seconds,
+                             'per_second': items / seconds if seconds else None,
+                             'peak_rss_mb': peak_rss_mb()})
+        return result
+
+
+def classify(plasmids, method):
+    '''
+    Calls a Plasmid classification method on every plasmid, dropping
+    those that raise NotPichia. Returns the plasmids that remain.
+    '''
+    kept = []
+    for oPlasmid in plasmids:
+        try:
+            method(oPlasmid)
+        except NotPichia:
+            continue
+        kept.append(oPlasmid)
+    return kept
+
+
+def reorient_and_find(oPlasmid):
+    '''
+    Retries the cassette search on the other strand or across the
+    origin, raising NotPichia if it still fails.
+    '''
+    if not oPlasmid.reorient():
+        raise NotPichia('No promoter on either strand')
+    oPlasmid.find_cassette()
+
+
+def bench_size(n, seed, workdir, skip, blast_sample, rearranged=0.0):
+    '''
+    Generates n plasmids, runs every stage, and returns (results, number
+    of ground truth mismatches).
+    '''
+    constructs = list(generate(n, seed, rearranged_fraction=rearranged))
+    fasta_files = write_library(workdir, constructs)
+    timer = Timer(skip)
+
+    records = timer.run('FASTA parse', n,
+                        lambda: [single_fasta_parser(file) for file in fasta_files])
+    if records is None:
+        records = [(construct['header'], construct['sequence']) for construct in constructs]
+
+    # Stage the Plasmid analysis one method at a time
+    plasmids = []
+    for (header, sequence), fasta_file in zip(records, fasta_files):
+        oPlasmid = Plasmid.__new__(Plasmid)
+        oPlasmid.fasta_file = os.path.basename(fasta_file)
+        oPlasmid.header = header
+        oPlasmid.DNA = sequence
+        oPlasmid.motifs = MotifIndex(sequence)
+        oPlasmid.strand = '+'
+        oPlasmid.offset = 0
+        plasmids.append(oPlasmid)
+    candidates = plasmids
+
+    def promoters():
+        return classify(plasmids, lambda p: setattr(p, 'promoter', p.get_promoter()))
+
+    def coding():
+        return classify(plasmids, lambda p: setattr(p, 'coding_sequence', p.get_coding_DNA()))
+
+    kept = timer.run('get_promoter', n, promoters)
+    plasmids = kept if kept is not None else promoters()
+    kept = timer.run('get_coding_DNA', len(plasmids), coding)
+    plasmids = kept if kept is not None else coding()
+
+    def reoriented():
+        # Plasmids on the reverse strand or rotated, as Plasmid.__init__
+        # retries them
+        forward = set(map(id, plasmids))
+        return classify([oPlasmid for oPlasmid in candidates if id(oPlasmid) not in forward],
+                        reorient_and_find)
+
+    kept = timer.run('reorient', n - len(plasmids), reoriented)
+    plasmids += kept if kept is not None else reoriented()
+    for name, method, attribute in [
+            ('backbone_check', Plasmid.backbone_check, 'backbone'),
+            ('secretion_check', Plasmid.secretion_check, 'secretion'),
+            ('translation', Plasmid.get_mature_protein, 'mature_recombinant')]:
+        def stage(method=method, attribute=attribute):
+            for oPlasmid in plasmids:
+                setattr(oPlasmid, attribute, method(oPlasmid))
+        if timer.run(name, len(plasmids), stage) is None:
+            stage()
+
+    for oPlasmid in plasmids:
+        oPlasmid.protein = Protein(os.path.dirname(oPlasmid.fasta_file), oPlasmid.fasta_file,
+                                   oPlasmid.header, oPlasmid.mature_recombinant,
+                                   characterize=False)
+    proteins = [oPlasmid.protein for oPlasmid in plasmids]
+    timer.run('mass', len(proteins),
+              lambda: [protein.mass(protein.amino_acids) for protein in proteins])
+    timer.run('pI (Biopython)', len(proteins),
+              lambda: [protein.get_pI() for protein in proteins])
+    timer.run('mass/pI/tag (batch)', len(proteins), lambda: characterize_proteins(proteins))
+    if proteins[0].mw is None:
+        characterize_proteins(proteins)
+
+    if BLAST_FILES:
+        count = min(n, blast_sample)
+        timer.run('BLAST XML parse', count, lambda: [
+            extract_hits(BLAST_FILES[idx % len(BLAST_FILES)]) for idx in range(count)])
+
+    manager = Manager()
+    manager.plasmids_list = plasmids
+
+    def dataframe():
+        manager.prepare_for_pandas(plasmids)
+        manager.create_df()
+
+    timer.run('DataFrame build', len(plasmids), dataframe)
+    if 'table render' not in timer.skip:
+        if 'DataFrame build' in timer.skip:
+            dataframe()
+        timer.run('table render', len(plasmids),
+                  lambda: (manager.create_table(show=False), manager.table.as_raw_html()))
+    if manager.summary is None:
+        manager.prepare_for_pandas(plasmids)
+    timer.run('table pages', len(plasmids),
+              lambda: manager.write_table(os.path.join(workdir, 'table')))
+
+    # Compare with the ground truth
+    found = {oPlasmid.header: oPlasmid for oPlasmid in plasmids}
+    mismatches = 0
+    for construct in constructs:
+        oPlasmid = found.get(construct['header'])
+        if not construct['pichia']:
+            mismatches += oPlasmid is not None
+        elif oPlasmid is None:
+            mismatches += 1
+        else:
+            mismatches += (oPlasmid.promoter, oPlasmid.secretion, oPlasmid.protein.tag,
+                           oPlasmid.mature_recombinant) != (
+                construct['promoter'], construct['secretion'], construct['tag'],
+                construct['protein'])
+    return timer.results, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stage-by-stage benchmark.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--skip', nargs='*', default=[], choices=STAGES,
+                        help='stages to leave out, e.g. "table render"')
+    parser.add_argument('--blast-sample', type=int, default=1000,
+                        help='at most this many BLAST XML files are parsed per size')
+    parser.add_argument('--rearranged', type=float, default=0.0,
+                        help='fraction of plasmids on the reverse strand or rotated')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    report = []
+    for n in args.sizes:
+        workdir = tempfile.mkdtemp(prefix='komagataella_bench_')
+        try:
+            results, mismatches = bench_size(n, args.seed, workdir, args.skip,
+                                             args.blast_sample, args.rearranged)
+        finally:
+            shutil.rmtree(workdir)
+        print(f'\n{n} plasmids ({mismatches} ground truth mismatches)')
+        print(f"{'stage':<22} {'items':>8} {'seconds':>10} {'items/s':>12} {'peak MB':>9}")
+        for result in results:
+            per_second = f"{result['per_second']:>12.0f}" if result['per_second'] else f"{'-':>12}"
+            print(f"{result['stage']:<22} {result['items']:>8} {result['seconds']:>10.3f} "
+                  f"{per_second} {result['peak_rss_mb']:>9.1f}")
+        report.append({'plasmids': n, 'mismatches': mismatches, 'stages': results})
+    if args.json:
+        with open(args.json, 'wt', encoding='utf-8') as jsonfile:
+            json.dump(report, jsonfile, indent=2)
+
+
+if __name__ == '__main__':
+    main()
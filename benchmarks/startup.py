@@ -0,0 +1,54 @@
+'''
+Startup benchmark: times how long `python main.py` takes to show the
+menu prompt, and exits with status 1 if the median is over the target.
+
+    python benchmarks/startup.py --runs 5 --target 0.5
+'''
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+PROMPT = b'What would you like to do?'
+
+
+def time_to_menu():
+    '''
+    Starts main.py, waits for the menu prompt, quits, and returns the
+    seconds from process start to prompt.
+    '''
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, 'main.py'], cwd=ROOT,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL)
+    output = b''
+    while PROMPT not in output:
+        chunk = os.read(process.stdout.fileno(), 4096)
+        if not chunk:
+            raise RuntimeError('main.py exited before showing the menu.')
+        output += chunk
+    elapsed = time.perf_counter() - start
+    process.communicate(b'9\n')
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time from launch to menu.')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--target', type=float, default=0.5,
+                        help='maximum median seconds to the menu')
+    args = parser.parse_args()
+    times = [time_to_menu() for _ in range(args.runs)]
+    median = statistics.median(times)
+    print(f'menu shown after {median:.3f} s (median of {args.runs}, '
+          f'min {min(times):.3f} s, max {max(times):.3f} s)')
+    if median > args.target:
+        print(f'slower than target of {args.target:.3f} s')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
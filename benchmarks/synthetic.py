@@ -0,0 +1,210 @@
+'''
+Deterministic generator of synthetic pPICZ/pGAPZ plasmids with known
+ground truth, for benchmarks.
+
+    python benchmarks/synthetic.py 1000 /tmp/synthetic --seed 1
+'''
+import os
+import sys
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from motif.Motif import PROMOTERS, CASSETTES, SIGNALS, reverse_complement
+from translation.Translation import GENETIC_CODE
+
+ANCHORS = sorted({anchor for start, _, end in PROMOTERS.values() for anchor in (start, end)}
+                 | {anchor for anchors in CASSETTES.values() for anchor in anchors}
+                 | {anchor for anchors in SIGNALS.values() for anchor in anchors})
+SENSE_CODONS = sorted(codon for codon, aa in GENETIC_CODE.items() if aa != '*')
+# Codons translated before the mature protein starts; Plasmid drops
+# these from the translation (89 for alpha, 92 for ost1)
+LEADER_CODONS = {'alpha': 89, 'ost1': 92}
+HIS_TAG = 'CATCACCATCACCATCAC'
+STOP = 'TAA'
+# gap cytoplasmic inserts sometimes start a few bases before the ATG
+GAP_EXTRA = ['', 'AC', 'CAA']
+
+
+def random_dna(rng, length):
+    '''
+    Returns length random bases.
+    '''
+    return ''.join(rng.choices('ACGT', k=length))
+
+
+def random_codons(rng, count):
+    '''
+    Returns count random sense codons.
+    '''
+    return ''.join(rng.choices(SENSE_CODONS, k=count))
+
+
+def leader(rng, secretion):
+    '''
+    Returns the DNA of a secretion signal: its start anchor, random
+    codons, and the processing site anchor, LEADER_CODONS long.
+    '''
+    start, end = SIGNALS[secretion]
+    middle = LEADER_CODONS[secretion] - (len(start) + len(end)) // 3
+    return start + random_codons(rng, middle) + end
+
+
+def translate(dna):
+    '''
+    Translates whole codons with the standard genetic code.
+    '''
+    return ''.join(GENETIC_CODE[dna[idx:idx + 3]] for idx in range(0, len(dna) - 2, 3))
+
+
+def anchor_counts(dna):
+    '''
+    Returns a dict with the number of occurrences of each anchor.
+    '''
+    counts = {}
+    for anchor in ANCHORS:
+        count = 0
+        position = dna.find(anchor)
+        while position != -1:
+            count += 1
+            position = dna.find(anchor, position + 1)
+        counts[anchor] = count
+    return counts
+
+
+def build_construct(rng, idx, promoter, secretion, tagged, length):
+    '''
+    Returns (DNA, expected anchor counts, mature protein) for one
+    expression plasmid.
+    '''
+    promoter_start, gap, promoter_end = PROMOTERS[promoter]
+    cassette_start, cassette_end = CASSETTES[promoter]
+    parts = [random_dna(rng, 200), promoter_start, random_dna(rng, gap), promoter_end]
+    if cassette_start != promoter_end:
+        parts += [random_dna(rng, 40), cassette_start]
+    coding = ''
+    if promoter == 'gap' and secretion == 'cytoplasmic':
+        coding += rng.choice(GAP_EXTRA)
+    if secretion == 'cytoplasmic':
+        coding += 'ATG' + random_codons(rng, length - 1)
+    else:
+        coding += leader(rng, secretion) + random_codons(rng, length)
+    if tagged:
+        coding += HIS_TAG
+    coding += STOP
+    parts += [coding, random_dna(rng, 30), cassette_end, random_dna(rng, 2500)]
+    dna = ''.join(parts)
+
+    expected = dict.fromkeys(ANCHORS, 0)
+    for anchor in (promoter_start, promoter_end, cassette_start, cassette_end):
+        expected[anchor] = 1
+    if secretion != 'cytoplasmic':
+        for anchor in SIGNALS[secretion]:
+            expected[anchor] = 1
+    protein = translate(coding[coding.index('ATG'):-len(STOP)])
+    if secretion != 'cytoplasmic':
+        protein = protein[LEADER_CODONS[secretion]:]
+    return dna, expected, protein
+
+
+def build_decoy(rng, idx):
+    '''
+    Returns (DNA, expected anchor counts) for a plasmid that is not a
+    pichia expression plasmid: either no promoter at all, or an aox1
+    promoter without the end of the expression cassette.
+    '''
+    expected = dict.fromkeys(ANCHORS, 0)
+    if rng.random() < 0.5:
+        return random_dna(rng, 5000), expected
+    promoter_start, gap, promoter_end = PROMOTERS['aox1']
+    dna = (random_dna(rng, 200) + promoter_start + random_dna(rng, gap)
+           + promoter_end + random_dna(rng, 3000))
+    expected[promoter_start] = 1
+    expected[promoter_end] = 1
+    return dna, expected
+
+
+def generate(n, seed=0, decoy_fraction=0.05, tag_fraction=0.3,
+             rearranged_fraction=0.0):
+    '''
+    Yields n construct dicts with header, sequence and ground truth:
+    promoter, secretion, tag and mature protein, or pichia=False for
+    decoys. The same n and seed always give the same constructs.
+    Random parts are redrawn until each anchor occurs exactly where it
+    was placed. A rearranged_fraction of the constructs are written as
+    the reverse strand and/or with the origin moved to a random point.
+    '''
+    rng = random.Random(seed)
+    promoters = list(PROMOTERS)
+    secretions = list(SIGNALS) + ['cytoplasmic']
+    for idx in range(1, n + 1):
+        name = f'pSYN{idx:06d}'
+        if rng.random() < decoy_fraction:
+            while True:
+                dna, expected = build_decoy(rng, idx)
+                if anchor_counts(dna) == expected:
+                    break
+            yield {'name': name, 'header': f'{name}_decoy', 'sequence': dna,
+                   'pichia': False}
+            continue
+        promoter = rng.choice(promoters)
+        secretion = rng.choice(secretions)
+        tagged = rng.random() < tag_fraction
+        length = rng.randint(80, 900)
+        while True:
+            dna, expected, protein = build_construct(rng, idx, promoter, secretion,
+                                                     tagged, length)
+            # Random codons may spell a His tag by chance; redraw
+            if anchor_counts(dna) == expected and ('HHHHHH' in protein) == tagged:
+                break
+        if rearranged_fraction and rng.random() < rearranged_fraction:
+            offset = rng.randrange(len(dna))
+            dna = dna[offset:] + dna[:offset]
+            if rng.random() < 0.5:
+                dna = reverse_complement(dna)
+        yield {'name': name, 'header': f'{name}_{promoter}_{secretion}',
+               'sequence': dna, 'pichia': True, 'promoter': promoter,
+               'secretion': secretion, 'tag': tagged, 'protein': protein}
+
+
+def write_fasta(fasta_file, header, sequence):
+    '''
+    Writes one record with 60 bases per line.
+    '''
+    with open(fasta_file, 'wt', encoding='utf-8') as fastafile:
+        fastafile.write(f'>{header}\n')
+        for idx in range(0, len(sequence), 60):
+            fastafile.write(sequence[idx:idx + 60] + '\n')
+
+
+def write_library(root, constructs):
+    '''
+    Writes constructs in the data folder layout, root/pSYNxxxxxx/pSYNxxxxxx.fa,
+    and returns the list of fasta files written.
+    '''
+    fasta_files = []
+    for construct in constructs:
+        folder = os.path.join(root, construct['name'])
+        os.makedirs(folder, exist_ok=True)
+        fasta_file = os.path.join(folder, f"{construct['name']}.fa")
+        write_fasta(fasta_file, construct['header'], construct['sequence'])
+        fasta_files.append(fasta_file)
+    return fasta_files
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Write a synthetic plasmid library.')
+    parser.add_argument('n', type=int)
+    parser.add_argument('root')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--decoys', type=float, default=0.05,
+                        help='fraction of non-pichia plasmids')
+    parser.add_argument('--rearranged', type=float, default=0.0,
+                        help='fraction of plasmids on the reverse strand or rotated')
+    args = parser.parse_args()
+    write_library(args.root, generate(args.n, args.seed, args.decoys,
+                                      rearranged_fraction=args.rearranged))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+'''
+Checks that the paginated table (table.Table) colours the kDa column
+as the great-tables table does. Masses on a fine grid across and
+beyond the colour domain, random masses and missing masses are
+coloured by great-tables data_color, with the options of
+Manager.build_table, and by kda_colours, and the background and text
+colours are compared. Exits with status 1 if any differ.
+
+    python benchmarks/table_colour_check.py --masses 2000 --seed 0
+'''
+import os
+import re
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+from great_tables import GT
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from table.Table import kda_colours, DOMAIN
+
+CELL = re.compile(r'<td style="color: (#[0-9A-Fa-f]{6}); background-color: (#[0-9A-Fa-f]{6});"')
+
+
+def great_tables_colours(kda):
+    '''
+    Returns (background, text) lists of the colours great-tables gives
+    the kDa cells of a table of kda.
+    '''
+    frame = pd.DataFrame({'kDa': kda})
+    page = (GT(frame)
+            .data_color(columns=['kDa'], palette=['rebeccapurple', 'white', 'orange'],
+                        na_color='white', domain=list(DOMAIN))
+            .as_raw_html())
+    cells = CELL.findall(page)
+    if len(cells) != len(kda):
+        raise RuntimeError(f'Found {len(cells)} coloured cells for {len(kda)} masses.')
+    return [background for _, background in cells], [text for text, _ in cells]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the paginated table colours.')
+    parser.add_argument('--masses', type=int, default=2000,
+                        help='random masses, besides the grid')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    low, high = min(DOMAIN), max(DOMAIN)
+    kda = np.concatenate([
+        np.round(np.arange(0, high + 20, 0.1), 1),
+        np.array(DOMAIN, dtype=np.float64),
+        rng.uniform(0, high + 20, args.masses),
+        np.full(5, np.nan),
+    ])
+    expected = great_tables_colours(kda)
+    found = kda_colours(kda)
+    differences = 0
+    for mass, background, text, found_background, found_text in zip(
+            kda.tolist(), *expected, *found):
+        if (background.upper(), text.upper()) != (found_background.upper(), found_text.upper()):
+            differences += 1
+            if differences <= 5:
+                print(f'{mass} kDa: great-tables {background} with {text} text, '
+                      f'kda_colours {found_background} with {found_text} text')
+    inside = int(np.sum((kda >= low) & (kda <= high)))
+    print(f'{len(kda)} masses ({inside} inside {low}-{high} kDa); {differences} differ')
+    if differences:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+import os
+import re
+import json
+import xml.etree.ElementTree as ET
+
+# Number of hits kept in the summary index
+TOP_HITS = 5
+INDEX_FORMAT = 1
+# 'chitinase [Zea mays]' -> description, organism
+DEFINITION_PARSER = re.compile(r'^(.*?)\[(.*?)\]')
+
+
+def index_file(xml_file):
+    '''
+    Returns the name of the summary index stored next to a blast
+    results file.
+    '''
+    return f'{xml_file}.summary.json'
+
+
+def xml_signature(xml_file):
+    '''
+    Returns [size, mtime_ns] of the blast results file.
+    '''
+    stat = os.stat(xml_file)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def parse_hit(hit):
+    '''
+    Returns a dict summarizing one <Hit> element and its first HSP.
+    '''
+    hit_id = hit.findtext('Hit_id', '')
+    id_parts = hit_id.split('|')
+    database = id_parts[0] if len(id_parts) > 1 else ''
+    identifier = id_parts[1] if len(id_parts) > 1 else hit_id
+    # Hit_def joins identical sequences with ' >'; keep the first one
+    definition = hit.findtext('Hit_def', '').split(' >')[0]
+    if match := DEFINITION_PARSER.search(definition):
+        description, organism = match.groups()
+    else:
+        description, organism = definition, ''
+    hsp = hit.find('Hit_hsps/Hsp')
+    evalue = ''
+    identity = None
+    if hsp is not None:
+        evalue = hsp.findtext('Hsp_evalue', '')
+        align_length = int(hsp.findtext('Hsp_align-len', '0'))
+        if align_length:
+            identity = 100 * int(hsp.findtext('Hsp_identity', '0')) / align_length
+    return {
+        'database': database,
+        'identifier': identifier.strip(),
+        'definition': definition.strip(),
+        'description': description.strip(),
+        'organism': organism.strip(),
+        'evalue': evalue,
+        'identity': identity,
+    }
+
+
+def extract_hits(xml_file, top=TOP_HITS):
+    '''
+    Streams a blast XML file and returns summaries of the first top
+    hits. Parsing stops after the last hit needed, and each hit element
+    is discarded once it has been read.
+    '''
+    hits = []
+    with open(xml_file, 'rb') as xmlfile:
+        for _, element in ET.iterparse(xmlfile, events=('end',)):
+            if element.tag != 'Hit':
+                continue
+            hits.append(parse_hit(element))
+            element.clear()
+            if len(hits) >= top:
+                break
+    return hits
+
+
+def load_hits(xml_file, top=TOP_HITS):
+    '''
+    Returns the summaries of the top hits in a blast results file. They
+    are read from the sidecar index when it is up to date; otherwise
+    the XML is streamed and the index is rewritten.
+    '''
+    signature = xml_signature(xml_file)
+    try:
+        with open(index_file(xml_file), 'rt', encoding='utf-8') as indexfile:
+            index = json.load(indexfile)
+        if (index['format'] == INDEX_FORMAT and index['signature'] == signature
+                and index['top'] >= top):
+            return index['hits'][:top]
+    except (OSError, ValueError, KeyError):
+        pass
+    hits = extract_hits(xml_file, top)
+    index = {'format': INDEX_FORMAT, 'signature': signature,
+             'top': top, 'hits': hits}
+    temp_file = f'{index_file(xml_file)}.tmp'
+    try:
+        with open(temp_file, 'wt', encoding='utf-8') as indexfile:
+            json.dump(index, indexfile)
+        os.replace(temp_file, index_file(xml_file))
+    except OSError:
+        # A read-only data folder still gets the hits, just no index
+        pass
+    return hits
@@ -0,0 +1,185 @@
+import os
+import re
+import json
+import time
+import hashlib
+import urllib.parse
+import urllib.request
+
+NCBI_BLAST_URL = 'https://blast.ncbi.nlm.nih.gov/Blast.cgi'
+QUEUE_NAME = '.komagataella_blast_queue.json'
+RID_PARSER = re.compile(r'^\s*RID = (\S+)', re.M)
+RTOE_PARSER = re.compile(r'^\s*RTOE = (\d+)', re.M)
+STATUS_PARSER = re.compile(r'^\s*Status=(\w+)', re.M)
+
+
+def write_atomic(file_name, text):
+    '''
+    Writes text to file_name through a temporary file in the same
+    folder, so readers never see a partial file.
+    '''
+    temp_file = f'{file_name}.tmp'
+    with open(temp_file, 'wt', encoding='utf-8') as outfile:
+        outfile.write(text)
+    os.replace(temp_file, file_name)
+
+
+class BlastQueue():
+    '''
+    Persistent queue of remote blast searches. Identical sequences are
+    searched once and the results are written to every file that asked
+    for them. At most max_in_flight searches run on the server at a time,
+    and requests are spaced at least request_interval seconds apart. The
+    queue, including the request IDs of running searches, is saved after
+    every change, so an interrupted run picks up where it stopped.
+    '''
+    def __init__(self, queue_file, url=None, program='blastp', database='nr',
+                 max_in_flight=3, request_interval=10, poll_interval=60,
+                 max_attempts=3, timeout=120):
+        self.queue_file = queue_file
+        # The endpoint can be pointed at a local stand-in server
+        self.url = url or os.environ.get('KOMAGATAELLA_BLAST_URL', NCBI_BLAST_URL)
+        self.program = program
+        self.database = database
+        self.max_in_flight = max_in_flight
+        self.request_interval = request_interval
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.last_request = 0
+        self.jobs = {}
+        self.load()
+
+    def load(self):
+        '''
+        Reads the saved queue, if there is one.
+        '''
+        try:
+            with open(self.queue_file, 'rt', encoding='utf-8') as queuefile:
+                self.jobs = json.load(queuefile)
+        except (OSError, ValueError):
+            self.jobs = {}
+
+    def save(self):
+        '''
+        Writes the queue atomically.
+        '''
+        write_atomic(self.queue_file, json.dumps(self.jobs))
+
+    def add(self, sequence, blast_file, rerun=False):
+        '''
+        Queues a search for sequence whose results go to blast_file. A
+        sequence that is already queued gets blast_file added to its
+        targets instead of a second search. A finished job left in the
+        queue by an interrupted run is searched again, since its results
+        were not written to blast_file.
+        '''
+        key = hashlib.sha1(sequence.encode()).hexdigest()
+        job = self.jobs.setdefault(key, {
+            'sequence': sequence,
+            'targets': [],
+            'status': 'pending',
+            'rid': None,
+            'next_poll': 0,
+            'attempts': 0,
+        })
+        if blast_file not in job['targets']:
+            job['targets'].append(blast_file)
+        if rerun or job['status'] in ('done', 'failed'):
+            job.update(status='pending', rid=None, attempts=0)
+        self.save()
+
+    def request(self, params):
+        '''
+        Sends one request to the blast server, waiting first if the last
+        request was less than request_interval seconds ago.
+        '''
+        wait = self.last_request + self.request_interval - time.time()
+        if wait > 0:
+            time.sleep(wait)
+        data = urllib.parse.urlencode(params).encode()
+        self.last_request = time.time()
+        with urllib.request.urlopen(self.url, data=data, timeout=self.timeout) as response:
+            return response.read().decode('utf-8', 'replace')
+
+    def submit(self, job):
+        '''
+        Submits a search and records its request ID.
+        '''
+        text = self.request({'CMD': 'Put', 'PROGRAM': self.program,
+                             'DATABASE': self.database, 'QUERY': job['sequence']})
+        rid_match = RID_PARSER.search(text)
+        if not rid_match:
+            raise ValueError('No RID in blast server response.')
+        rtoe_match = RTOE_PARSER.search(text)
+        estimate = int(rtoe_match.group(1)) if rtoe_match else 0
+        job.update(status='running', rid=rid_match.group(1),
+                   next_poll=time.time() + max(estimate, self.poll_interval))
+        print(f"Submitted {len(job['targets'])} file(s) as RID {job['rid']}")
+
+    def poll(self, job):
+        '''
+        Checks a running search and fetches the results when ready.
+        '''
+        text = self.request({'CMD': 'Get', 'FORMAT_OBJECT': 'SearchInfo',
+                             'RID': job['rid']})
+        status_match = STATUS_PARSER.search(text)
+        status = status_match.group(1) if status_match else 'UNKNOWN'
+        if status == 'WAITING':
+            job['next_poll'] = time.time() + self.poll_interval
+        elif status == 'READY':
+            xml = self.request({'CMD': 'Get', 'FORMAT_TYPE': 'XML',
+                                'RID': job['rid']})
+            for blast_file in job['targets']:
+                write_atomic(blast_file, xml)
+                print(f'Wrote blast_file_out: {blast_file}')
+            job['status'] = 'done'
+        elif status == 'FAILED':
+            # Polling a failed RID again cannot succeed; search again
+            job['attempts'] += 1
+            print(f"Blast search {job['rid']} failed on the server; attempt {job['attempts']}.")
+            if job['attempts'] >= self.max_attempts:
+                job['status'] = 'failed'
+            else:
+                job.update(status='pending', rid=None,
+                           next_poll=time.time() + self.poll_interval)
+        else:
+            # The server no longer knows the RID; search again
+            print(f"RID {job['rid']} expired, resubmitting.")
+            job.update(status='pending', rid=None)
+
+    def run(self):
+        '''
+        Submits and polls searches until every job is done or failed.
+        Returns the number of failed jobs.
+        '''
+        while True:
+            pending = [job for job in self.jobs.values() if job['status'] == 'pending']
+            running = [job for job in self.jobs.values() if job['status'] == 'running']
+            if not pending and not running:
+                break
+            candidates = running
+            if len(running) < self.max_in_flight:
+                candidates = running + pending
+            job = min(candidates, key=lambda job: job['next_poll'])
+            wait = job['next_poll'] - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            action = self.submit if job['status'] == 'pending' else self.poll
+            try:
+                action(job)
+            except (OSError, ValueError) as error:
+                # urllib errors are OSErrors; retry a few times
+                job['attempts'] += 1
+                print(f"Blast request failed ({error}); attempt {job['attempts']}.")
+                if job['attempts'] >= self.max_attempts:
+                    job['status'] = 'failed'
+                else:
+                    job['next_poll'] = time.time() + self.poll_interval
+            self.save()
+        failed = sum(job['status'] == 'failed' for job in self.jobs.values())
+        # Finished searches are not needed to resume
+        self.jobs = {key: job for key, job in self.jobs.items()
+                     if job['status'] != 'done'}
+        self.save()
+        return failed
@@ -0,0 +1,165 @@
+import os
+import json
+import hashlib
+from plasmid.Plasmid import Plasmid
+from protein.Protein import Protein
+
+# Bump when the record layout changes. The analysis source files are
+# also hashed into the version, so editing them invalidates the cache.
+CACHE_FORMAT = 1
+ANALYSIS_SOURCES = [
+    os.path.join(os.path.dirname(__file__), '..', 'plasmid', 'Plasmid.py'),
+    os.path.join(os.path.dirname(__file__), '..', 'protein', 'Protein.py'),
+    os.path.join(os.path.dirname(__file__), '..', 'motif', 'Motif.py'),
+    os.path.join(os.path.dirname(__file__), '..', 'translation', 'Translation.py'),
+    os.path.join(os.path.dirname(__file__), '..', 'composition', 'Composition.py'),
+    os.path.join(os.path.dirname(__file__), '..', 'blast', 'Blast.py'),
+    os.path.join(os.path.dirname(__file__), '..', 'backbone', 'Backbone.py'),
+    os.path.join(os.path.dirname(__file__), '..', 'backbone', 'references.fa'),
+]
+CACHE_NAME = '.komagataella_cache.json'
+
+# Cache files that could not be written, so each is warned about once
+_unwritable = set()
+
+
+def analysis_version():
+    '''
+    Returns a string that changes whenever the cache format or any of
+    the analysis source files changes.
+    '''
+    digest = hashlib.sha256(str(CACHE_FORMAT).encode())
+    for source in ANALYSIS_SOURCES:
+        with open(source, 'rb') as source_file:
+            digest.update(source_file.read())
+    return digest.hexdigest()[:16]
+
+
+def file_signature(chosen_file):
+    '''
+    Returns [size, mtime_ns] for the fasta file and its blast results
+    file. A missing blast file is recorded as [0, 0].
+    '''
+    signature = []
+    for file in (chosen_file, f'{chosen_file}_blast.xml'):
+        try:
+            stat = os.stat(file)
+            signature += [stat.st_size, stat.st_mtime_ns]
+        except FileNotFoundError:
+            signature += [0, 0]
+    return signature
+
+
+class Cache():
+    '''
+    Persistent store of analysis results, keyed by fasta file path and
+    validated by file size and modification time. Files that are not
+    pichia expression plasmids are stored with a record of None.
+    '''
+    def __init__(self, root):
+        self.cache_file = os.path.join(root, CACHE_NAME)
+        self.version = analysis_version()
+        self.entries = {}
+        self.seen = set()
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def load(self):
+        '''
+        Reads the cache file. A missing, unreadable or outdated cache
+        is discarded.
+        '''
+        try:
+            with open(self.cache_file, 'rt', encoding='utf-8') as cachefile:
+                data = json.load(cachefile)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == self.version:
+            self.entries = data.get('entries', {})
+
+    def lookup(self, chosen_file):
+        '''
+        Returns (found, plasmid). found is False if the file is new or
+        changed. plasmid is None for known non-pichia files.
+        '''
+        self.seen.add(chosen_file)
+        entry = self.entries.get(chosen_file)
+        if entry is None or entry['signature'] != file_signature(chosen_file):
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        if entry['record'] is None:
+            return True, None
+        path = os.path.dirname(chosen_file)
+        fasta_file = os.path.basename(chosen_file)
+        return True, from_record(path, fasta_file, entry['record'])
+
+    def store(self, chosen_file, oPlasmid):
+        '''
+        Stores the analysis result for chosen_file. oPlasmid may be None
+        for a file that is not a pichia expression plasmid.
+        '''
+        self.seen.add(chosen_file)
+        record = to_record(oPlasmid) if oPlasmid is not None else None
+        self.entries[chosen_file] = {
+            'signature': file_signature(chosen_file),
+            'record': record,
+        }
+
+    def keep(self, chosen_files):
+        '''
+        Marks entries as still in use without looking them up, so save()
+        does not drop them.
+        '''
+        self.seen.update(chosen_files)
+
+    def save(self):
+        '''
+        Drops entries for files that were not looked up in this run and
+        writes the cache atomically. A library folder that cannot be
+        written is analyzed as before, just without saving the cache.
+        '''
+        self.entries = {file: entry for file, entry in self.entries.items()
+                        if file in self.seen}
+        temp_file = f'{self.cache_file}.tmp'
+        try:
+            with open(temp_file, 'wt', encoding='utf-8') as cachefile:
+                json.dump({'version': self.version, 'entries': self.entries},
+                          cachefile)
+            os.replace(temp_file, self.cache_file)
+        except OSError as error:
+            if self.cache_file not in _unwritable:
+                _unwritable.add(self.cache_file)
+                print(f'Warning: analysis cache not saved ({error}).')
+
+
+def to_record(oPlasmid):
+    '''
+    Returns a dict with the computed fields of a Plasmid object.
+    '''
+    protein = oPlasmid.protein
+    return {
+        'header': oPlasmid.header,
+        'strand': oPlasmid.strand,
+        'offset': oPlasmid.offset,
+        'promoter': oPlasmid.promoter,
+        'secretion': oPlasmid.secretion,
+        'coding_sequence': oPlasmid.coding_sequence,
+        'backbone': oPlasmid.backbone,
+        'mature_recombinant': oPlasmid.mature_recombinant,
+        'mw': protein.mw,
+        'pI': protein.pI,
+        'tag': protein.tag,
+        'identifier': protein.identifier,
+        'description': protein.description,
+        'organism': protein.organism,
+    }
+
+
+def from_record(path, fasta_file, record):
+    '''
+    Rebuilds a Plasmid object (with its Protein) from a cached record.
+    '''
+    protein = Protein.from_record(path, fasta_file, record)
+    return Plasmid.from_record(fasta_file, record, protein)
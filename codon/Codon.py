@@ -0,0 +1,140 @@
+import numpy as np
+from translation.Translation import GENETIC_CODE
+
+# Codon usage of Komagataella phaffii (Pichia pastoris) genes, in codons
+# per thousand, from the Codon Usage Database (Kazusa)
+KPHAFFII_USAGE = {
+    'TTT': 24.1, 'TCT': 24.4, 'TAT': 16.0, 'TGT': 7.7,
+    'TTC': 20.6, 'TCC': 16.5, 'TAC': 18.1, 'TGC': 4.4,
+    'TTA': 15.6, 'TCA': 15.2, 'TAA': 0.8, 'TGA': 0.3,
+    'TTG': 31.5, 'TCG': 7.4, 'TAG': 0.5, 'TGG': 10.3,
+    'CTT': 15.9, 'CCT': 15.8, 'CAT': 11.8, 'CGT': 6.9,
+    'CTC': 7.6, 'CCC': 6.8, 'CAC': 9.1, 'CGC': 2.2,
+    'CTA': 10.7, 'CCA': 18.9, 'CAA': 25.4, 'CGA': 4.2,
+    'CTG': 14.9, 'CCG': 3.9, 'CAG': 16.3, 'CGG': 1.9,
+    'ATT': 31.1, 'ACT': 22.4, 'AAT': 25.1, 'AGT': 12.5,
+    'ATC': 19.4, 'ACC': 14.5, 'AAC': 26.7, 'AGC': 7.6,
+    'ATA': 11.1, 'ACA': 13.8, 'AAA': 29.9, 'AGA': 20.1,
+    'ATG': 18.7, 'ACG': 6.0, 'AAG': 33.8, 'AGG': 6.0,
+    'GTT': 26.9, 'GCT': 28.9, 'GAT': 35.7, 'GGT': 25.5,
+    'GTC': 14.9, 'GCC': 16.6, 'GAC': 25.9, 'GGC': 6.0,
+    'GTA': 9.9, 'GCA': 15.1, 'GAA': 37.4, 'GGA': 19.6,
+    'GTG': 12.3, 'GCG': 3.9, 'GAG': 29.9, 'GGG': 4.3,
+}
+BASES = 'ACGT'
+# Codons are numbered 0-63 from their bases; 64 is any codon with a
+# base other than A, C, G or T
+CODONS = [first + second + third for first in BASES for second in BASES for third in BASES]
+AMBIGUOUS = len(CODONS)
+N_COLUMNS = len(CODONS) + 1
+# Codons whose relative adaptiveness is below this are rare
+RARE_W = 0.25
+# A rare-codon cluster is a stretch where CLUSTER_WINDOW consecutive
+# codons include at least CLUSTER_RARE rare ones
+CLUSTER_WINDOW = 10
+CLUSTER_RARE = 3
+# Sequences are counted in blocks, as in composition.Composition
+BLOCK = 256
+
+
+def build_base_index():
+    '''
+    Returns a 256 entry array that maps an ASCII byte to its position in
+    BASES, or 4 for anything else. Lower case and U are accepted.
+    '''
+    base_index = np.full(256, len(BASES), dtype=np.intp)
+    for idx, base in enumerate(BASES):
+        base_index[ord(base)] = idx
+        base_index[ord(base.lower())] = idx
+    base_index[ord('U')] = base_index[ord('u')] = BASES.index('T')
+    return base_index
+
+
+def relative_adaptiveness(usage):
+    '''
+    Returns an array with the relative adaptiveness w of each codon: its
+    usage divided by that of the most used codon for the same amino
+    acid.
+    '''
+    most_used = {}
+    for codon, frequency in usage.items():
+        amino_acid = GENETIC_CODE[codon]
+        most_used[amino_acid] = max(most_used.get(amino_acid, 0.0), frequency)
+    return np.array([usage[codon] / most_used[GENETIC_CODE[codon]] for codon in CODONS])
+
+
+BASE_INDEX = build_base_index()
+STOP = np.array([GENETIC_CODE[codon] == '*' for codon in CODONS] + [False])
+# Met, Trp and stop codons have no synonyms and are left out of the CAI
+CAI_CODONS = np.array([GENETIC_CODE[codon] not in 'MW*' for codon in CODONS])
+WEIGHTS = relative_adaptiveness(KPHAFFII_USAGE)
+LOG_WEIGHTS = np.where(CAI_CODONS, np.log(WEIGHTS), 0.0)
+RARE = np.append((WEIGHTS < RARE_W) & ~STOP[:-1], False)
+GC_BASES = np.array([sum(base in 'GC' for base in codon) for codon in CODONS])
+
+
+def codon_numbers(sequences):
+    '''
+    Returns (codon numbers, row of each codon) for the open reading
+    frames of sequences joined together. Each frame runs from the first
+    base up to, but not including, the first TAA, TAG or TGA codon.
+    '''
+    trimmed = [sequence[:len(sequence) // 3 * 3] for sequence in sequences]
+    lengths = np.fromiter((len(sequence) // 3 for sequence in trimmed), dtype=np.intp,
+                          count=len(trimmed))
+    raw = np.frombuffer(''.join(trimmed).encode('ascii', 'replace'), dtype=np.uint8)
+    bases = BASE_INDEX[raw].reshape(-1, 3)
+    codons = (bases[:, 0] * 4 + bases[:, 1]) * 4 + bases[:, 2]
+    codons[(bases == len(BASES)).any(axis=1)] = AMBIGUOUS
+    rows = np.repeat(np.arange(len(trimmed)), lengths)
+    # Each frame ends at its first stop, or at the end of its sequence
+    ends = np.cumsum(lengths)
+    stops = np.flatnonzero(STOP[codons])
+    stop_rows, first = np.unique(rows[stops], return_index=True)
+    ends[stop_rows] = stops[first]
+    keep = np.arange(len(codons)) < ends[rows]
+    return codons[keep], rows[keep]
+
+
+def rare_clusters(codons, rows, n):
+    '''
+    Returns the number of rare-codon clusters in each of n frames, given
+    the codon numbers and rows from codon_numbers.
+    '''
+    clusters = np.zeros(n, dtype=np.int64)
+    if len(codons) < CLUSTER_WINDOW:
+        return clusters
+    rare = np.concatenate(([0], np.cumsum(RARE[codons])))
+    in_window = rare[CLUSTER_WINDOW:] - rare[:-CLUSTER_WINDOW]
+    # Windows that span two frames are not counted
+    starts = rows[:len(in_window)]
+    hot = (in_window >= CLUSTER_RARE) & (starts == rows[CLUSTER_WINDOW - 1:])
+    # Overlapping hot windows make up one cluster
+    first_hot = hot.copy()
+    first_hot[1:] &= ~(hot[:-1] & (starts[1:] == starts[:-1]))
+    return clusters + np.bincount(starts[first_hot], minlength=n)
+
+
+def codon_usage(sequences):
+    '''
+    Returns arrays of the codon adaptation index against K. phaffii, GC
+    content in percent, number of rare codons and number of rare-codon
+    clusters for each coding sequence. All sequences are counted into
+    one codon-count matrix in a few NumPy passes. Values are NaN for
+    sequences without counted codons.
+    '''
+    n = len(sequences)
+    blocks = [np.zeros((0, N_COLUMNS), dtype=np.intp)]
+    clusters = [np.zeros(0, dtype=np.int64)]
+    for first in range(0, n, BLOCK):
+        block = sequences[first:first + BLOCK]
+        codons, rows = codon_numbers(block)
+        counts = np.bincount(rows * N_COLUMNS + codons, minlength=len(block) * N_COLUMNS)
+        blocks.append(counts.reshape(len(block), N_COLUMNS))
+        clusters.append(rare_clusters(codons, rows, len(block)))
+    counts = np.vstack(blocks)[:, :AMBIGUOUS]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cai = np.exp(counts @ LOG_WEIGHTS / counts[:, CAI_CODONS].sum(axis=1))
+        gc = 100 * (counts @ GC_BASES) / (3 * counts.sum(axis=1))
+    rare = counts @ RARE[:-1].astype(np.int64)
+    return cai, gc, rare, np.concatenate(clusters)
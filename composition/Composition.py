@@ -0,0 +1,143 @@
+import numpy as np
+from protein.Protein import WATER, MASS_DICT, UNKNOWN_MASS, HIS_TAG
+from memo.Memo import MEMO
+
+# Column order of the residue-count matrix. The last column counts
+# everything else (X from ambiguous codons, stray characters).
+RESIDUES = 'ACDEFGHIKLMNPQRSTVWY'
+OTHER = len(RESIDUES)
+N_COLUMNS = len(RESIDUES) + 1
+# Sequences are counted in blocks so the per-residue row index array
+# stays small for very large libraries
+BLOCK = 1024
+
+# Bjellqvist pK values, as used by Bio.SeqUtils.IsoelectricPoint
+POSITIVE_PKS = {'K': 10.0, 'R': 12.0, 'H': 5.98}
+NEGATIVE_PKS = {'D': 4.05, 'E': 4.45, 'C': 9.0, 'Y': 10.0}
+NTERM_PK = 7.5
+CTERM_PK = 3.55
+NTERM_PKS = {'A': 7.59, 'M': 7.0, 'S': 6.93, 'P': 8.36, 'T': 6.82,
+             'V': 7.44, 'E': 7.7}
+CTERM_PKS = {'D': 4.55, 'E': 4.75}
+
+
+def build_residue_index():
+    '''
+    Returns a 256 entry array that maps an ASCII byte to its column in
+    the residue-count matrix.
+    '''
+    residue_index = np.full(256, OTHER, dtype=np.intp)
+    for idx, residue in enumerate(RESIDUES):
+        residue_index[ord(residue)] = idx
+    return residue_index
+
+
+RESIDUE_INDEX = build_residue_index()
+RESIDUE_MASSES = np.array([MASS_DICT[residue] for residue in RESIDUES] + [UNKNOWN_MASS])
+POSITIVE_COLUMNS = [RESIDUES.index(residue) for residue in POSITIVE_PKS]
+NEGATIVE_COLUMNS = [RESIDUES.index(residue) for residue in NEGATIVE_PKS]
+
+
+def count_matrix(sequences):
+    '''
+    Returns an (n, 21) integer array with the count of each residue in
+    RESIDUES, plus other characters, for each of n protein sequences.
+    '''
+    blocks = [np.zeros((0, N_COLUMNS), dtype=np.intp)]
+    for first in range(0, len(sequences), BLOCK):
+        block = sequences[first:first + BLOCK]
+        lengths = np.fromiter(map(len, block), dtype=np.intp, count=len(block))
+        raw = np.frombuffer(''.join(block).encode('ascii', 'replace'), dtype=np.uint8)
+        rows = np.repeat(np.arange(len(block)), lengths)
+        counts = np.bincount(rows * N_COLUMNS + RESIDUE_INDEX[raw],
+                             minlength=len(block) * N_COLUMNS)
+        blocks.append(counts.reshape(len(block), N_COLUMNS))
+    return np.vstack(blocks)
+
+
+def masses(counts):
+    '''
+    Returns the monoisotopic mass in kDa for each row of a residue-count
+    matrix, as Protein.mass would.
+    '''
+    return (WATER + counts @ RESIDUE_MASSES) / 1000
+
+
+def isoelectric_points(sequences, counts):
+    '''
+    Returns the pI of each sequence. This is the bisection of
+    Bio.SeqUtils.IsoelectricPoint run on all sequences at once: same pK
+    values, terminal corrections, starting pH and stopping width.
+    '''
+    n = len(sequences)
+    nterm_pks = np.array([NTERM_PKS.get(sequence[:1], NTERM_PK) for sequence in sequences])
+    cterm_pks = np.array([CTERM_PKS.get(sequence[-1:], CTERM_PK) for sequence in sequences])
+    positive_pks = np.column_stack([nterm_pks] + [np.full(n, pK) for pK in POSITIVE_PKS.values()])
+    negative_pks = np.column_stack([cterm_pks] + [np.full(n, pK) for pK in NEGATIVE_PKS.values()])
+    # Each terminus counts once
+    positive_counts = np.column_stack([np.ones(n), counts[:, POSITIVE_COLUMNS]])
+    negative_counts = np.column_stack([np.ones(n), counts[:, NEGATIVE_COLUMNS]])
+
+    pH = np.full(n, 7.775)
+    low = np.full(n, 4.05)
+    high = np.full(n, 12.0)
+    active = high - low > 0.0001
+    while active.any():
+        charge = (
+            (positive_counts / (10 ** (pH[:, None] - positive_pks) + 1.0)).sum(axis=1)
+            - (negative_counts / (10 ** (negative_pks - pH[:, None]) + 1.0)).sum(axis=1)
+        )
+        low = np.where(active & (charge > 0.0), pH, low)
+        high = np.where(active & (charge <= 0.0), pH, high)
+        pH = np.where(active, (low + high) / 2, pH)
+        active = high - low > 0.0001
+    return pH
+
+
+def his_tags(sequences):
+    '''
+    Returns a list with True for each sequence that contains a His tag.
+    '''
+    return [bool(sequence) and HIS_TAG in sequence for sequence in sequences]
+
+
+def characterize(sequences):
+    '''
+    Returns (masses, pIs, tags) for a list of protein sequences, computed
+    from a single residue-count matrix.
+    '''
+    counts = count_matrix(sequences)
+    return masses(counts), isoelectric_points(sequences, counts), his_tags(sequences)
+
+
+def characterize_proteins(proteins):
+    '''
+    Fills in mw, pI and tag for a list of Protein objects created with
+    characterize=False. Each distinct sequence is characterized once,
+    and only if it is not already in the insert memo.
+    '''
+    if not proteins:
+        return
+    groups = {}
+    for protein in proteins:
+        groups.setdefault(protein.amino_acids, []).append(protein)
+    results = {}
+    missing = []
+    for sequence, group in groups.items():
+        key = MEMO.key('protein', sequence)
+        found, results[sequence] = MEMO.lookup(key)
+        if not found:
+            missing.append((sequence, key))
+        # Later copies in this batch reuse the first result
+        MEMO.count('protein', memory=len(group) - 1)
+    if missing:
+        mws, pIs, tags = characterize([sequence for sequence, _ in missing])
+        for (sequence, key), mw, pI, tag in zip(missing, mws.tolist(), pIs.tolist(), tags):
+            results[sequence] = (mw, tag, pI)
+            MEMO.remember(key, results[sequence])
+    for sequence, group in groups.items():
+        mw, tag, pI = results[sequence]
+        for protein in group:
+            protein.mw = mw
+            protein.pI = pI
+            protein.tag = tag
@@ -0,0 +1,105 @@
+import os
+import bz2
+import gzip
+import tarfile
+import zipfile
+
+FASTA_SUFFIXES = ('.fa', '.fasta', '.fna')
+COMPRESSED_SUFFIXES = {'.gz': gzip.open, '.bz2': bz2.open}
+
+
+def parse_fasta(handle):
+    '''
+    Takes an open text handle (or any iterable of lines) and yields (header, sequence) for each
+    record. Sequence lines are collected in a list and joined once, so
+    the cost is linear in the size of the record.
+    '''
+    header = None
+    lines = []
+    for line in handle:
+        line = line.strip()
+        if line.startswith('>'):
+            if header is not None:
+                yield (header, ''.join(lines))
+            header = line[1:]
+            lines = []
+        elif header is not None:
+            lines.append(line)
+    if header is not None:
+        yield (header, ''.join(lines))
+
+
+def is_fasta_name(name):
+    '''
+    Returns True for names ending in a fasta suffix, optionally followed
+    by a compression suffix.
+    '''
+    stem, suffix = os.path.splitext(name.lower())
+    if suffix in COMPRESSED_SUFFIXES:
+        suffix = os.path.splitext(stem)[1]
+    return suffix in FASTA_SUFFIXES
+
+
+def decompress(name, binary_handle):
+    '''
+    Wraps a binary handle in a decompressor chosen from the name, then
+    yields its lines as text. Lines are decoded one at a time because
+    streamed tar members cannot be wrapped in io.TextIOWrapper.
+    '''
+    suffix = os.path.splitext(name.lower())[1]
+    if suffix in COMPRESSED_SUFFIXES:
+        binary_handle = COMPRESSED_SUFFIXES[suffix](binary_handle)
+    for line in binary_handle:
+        yield line.decode('utf-8')
+
+
+def read_records(source):
+    '''
+    Yields (name, header, sequence) for every record in source. source
+    may be a fasta file with one or more records, a gzip or bz2
+    compressed fasta file, or a tar/zip archive of fasta files. name is
+    the archive member the record came from, or the file name of source.
+    '''
+    # Files named like fasta files are read directly; sniffing for an
+    # archive costs more than parsing a small plasmid
+    if is_fasta_name(source):
+        archive_type = None
+    elif zipfile.is_zipfile(source):
+        archive_type = 'zip'
+    elif tarfile.is_tarfile(source):
+        archive_type = 'tar'
+    else:
+        archive_type = None
+    if archive_type == 'zip':
+        with zipfile.ZipFile(source) as archive:
+            for member in archive.infolist():
+                if member.is_dir() or not is_fasta_name(member.filename):
+                    continue
+                with archive.open(member) as binary_handle:
+                    for header, sequence in parse_fasta(
+                            decompress(member.filename, binary_handle)):
+                        yield (member.filename, header, sequence)
+    elif archive_type == 'tar':
+        # Stream mode reads the members in order without seeking
+        with tarfile.open(source, 'r|*') as archive:
+            for member in archive:
+                if not member.isfile() or not is_fasta_name(member.name):
+                    continue
+                binary_handle = archive.extractfile(member)
+                for header, sequence in parse_fasta(
+                        decompress(member.name, binary_handle)):
+                    yield (member.name, header, sequence)
+    else:
+        with open(source, 'rb') as binary_handle:
+            for header, sequence in parse_fasta(
+                    decompress(source, binary_handle)):
+                yield (os.path.basename(source), header, sequence)
+
+
+def read_fasta(source):
+    '''
+    Yields (header, sequence) for every record in source. See
+    read_records for the accepted formats.
+    '''
+    for _, header, sequence in read_records(source):
+        yield (header, sequence)
@@ -0,0 +1,153 @@
+import os
+import sqlite3
+from cache.Cache import analysis_version
+
+INDEX_NAME = '.komagataella_index.sqlite'
+# Columns returned by queries, in order
+FIELDS = ['file', 'header', 'promoter', 'secretion', 'tag', 'mw', 'pI',
+          'length', 'coding_bp', 'identifier', 'description', 'organism']
+# Columns that can be used to order query results
+ORDER_FIELDS = ('header', 'promoter', 'secretion', 'tag', 'mw', 'pI', 'length')
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS plasmids (
+    file TEXT PRIMARY KEY,
+    header TEXT NOT NULL,
+    promoter TEXT NOT NULL,
+    secretion TEXT NOT NULL,
+    tag INTEGER NOT NULL,
+    mw REAL,
+    pI REAL,
+    length INTEGER NOT NULL,
+    coding_bp INTEGER NOT NULL,
+    identifier TEXT,
+    description TEXT,
+    organism TEXT
+);
+CREATE INDEX IF NOT EXISTS plasmids_header ON plasmids (header);
+CREATE INDEX IF NOT EXISTS plasmids_promoter ON plasmids (promoter);
+CREATE INDEX IF NOT EXISTS plasmids_secretion ON plasmids (secretion);
+CREATE INDEX IF NOT EXISTS plasmids_tag ON plasmids (tag);
+CREATE INDEX IF NOT EXISTS plasmids_mw ON plasmids (mw);
+CREATE INDEX IF NOT EXISTS plasmids_pI ON plasmids (pI);
+'''
+
+
+class LibraryIndex():
+    '''
+    SQLite index of the analyzed library, one row per fasta file, with
+    indexes on promoter, secretion signal, His tag, mass, pI and header.
+    Queries read the rows directly, so no Plasmid objects are built.
+    The index is emptied when the analysis code changes.
+    '''
+    def __init__(self, root):
+        self.index_file = os.path.join(root, INDEX_NAME)
+        self.connection = sqlite3.connect(self.index_file)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(SCHEMA)
+        version = analysis_version()
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or row['value'] != version:
+            with self.connection:
+                self.connection.execute('DELETE FROM plasmids')
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO meta VALUES ('version', ?)", (version,))
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM plasmids').fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def close(self):
+        self.connection.close()
+
+    def update(self, plasmids):
+        '''
+        Adds or replaces the rows for plasmids (Plasmid objects).
+        '''
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO plasmids VALUES ({', '.join('?' * len(FIELDS))})",
+                (to_row(oPlasmid) for oPlasmid in plasmids))
+
+    def remove(self, files):
+        '''
+        Removes the rows for the given fasta files.
+        '''
+        with self.connection:
+            self.connection.executemany('DELETE FROM plasmids WHERE file = ?',
+                                        ((file,) for file in files))
+
+    def sync(self, plasmids):
+        '''
+        Makes the index hold exactly plasmids: rows are added or replaced
+        for them and rows for any other file are removed.
+        '''
+        current = {plasmid_file(oPlasmid) for oPlasmid in plasmids}
+        stale = [row[0] for row in self.connection.execute('SELECT file FROM plasmids')
+                 if row[0] not in current]
+        self.remove(stale)
+        self.update(plasmids)
+        # Statistics let SQLite pick the most selective index
+        self.connection.execute('ANALYZE')
+
+    def query(self, promoter=None, secretion=None, tag=None, min_kda=None,
+              max_kda=None, min_pI=None, max_pI=None, header=None,
+              order_by='header', limit=None):
+        '''
+        Returns a list of dicts (with the FIELDS keys) for the plasmids
+        matching every given criterion. header matches the start of the
+        plasmid header. Mass is in kDa.
+        '''
+        if order_by not in ORDER_FIELDS:
+            raise ValueError(f'Cannot order by {order_by}; use one of {", ".join(ORDER_FIELDS)}')
+        conditions = []
+        parameters = []
+        for condition, value in (('promoter = ?', promoter),
+                                 ('secretion = ?', secretion),
+                                 ('mw >= ?', min_kda),
+                                 ('mw <= ?', max_kda),
+                                 ('pI >= ?', min_pI),
+                                 ('pI <= ?', max_pI)):
+            if value is not None:
+                conditions.append(condition)
+                parameters.append(value)
+        if tag is not None:
+            conditions.append('tag = ?')
+            parameters.append(int(bool(tag)))
+        if header:
+            # A range on the header, unlike LIKE, can use its index
+            conditions.append('header >= ? AND header < ?')
+            parameters += [header, header + '\U0010ffff']
+        sql = f"SELECT {', '.join(FIELDS)} FROM plasmids"
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += f' ORDER BY {order_by}, file'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            parameters.append(int(limit))
+        return [dict(row) for row in self.connection.execute(sql, parameters)]
+
+
+def plasmid_file(oPlasmid):
+    '''
+    Returns the fasta file path of a Plasmid object.
+    '''
+    return f'{oPlasmid.protein.path}/{oPlasmid.fasta_file}'
+
+
+def to_row(oPlasmid):
+    '''
+    Returns the index row, in FIELDS order, for a Plasmid object.
+    '''
+    protein = oPlasmid.protein
+    return (plasmid_file(oPlasmid), oPlasmid.header, oPlasmid.promoter,
+            oPlasmid.secretion, int(bool(protein.tag)), protein.mw, protein.pI,
+            protein.length, len(oPlasmid.coding_sequence), protein.identifier,
+            protein.description, protein.organism)
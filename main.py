@@ -1,6 +1,13 @@
 import os
+import sys
 from bcolors.bcolors import bcolors
 from manager.Manager import Manager
+from profiling.Profiling import PROFILER, enable, enabled
+
+PROFILE_FILE = 'komagataella_profile.json'
+# Headless commands, run without the menu (python main.py summarize ...)
+COMMANDS = ('summarize', 'plan', 'shard', 'merge')
+TRACE_FILE = 'komagataella_trace.json'
 
 def greeting():
     '''
@@ -22,6 +29,17 @@ def goodbye():
     print(f'{bcolors.OKGREEN}Thank you for using komatagaella!{bcolors.ENDC}')
     print()
 
+def write_profile():
+    '''
+    Prints the per-stage timings and writes them, with a Chrome trace,
+    to the working directory.
+    '''
+    PROFILER.report()
+    PROFILER.write_json(PROFILE_FILE)
+    PROFILER.write_chrome_trace(TRACE_FILE)
+    print(f'Wrote {PROFILE_FILE} and {TRACE_FILE}')
+    print()
+
 def menu():
     '''
     Prints a menu and returns the selection as an integer.
@@ -34,6 +52,17 @@ def menu():
     print(f'    the {bcolors.OKBLUE}data{bcolors.ENDC} folder.')
     print('2 - Work with all plasmids/proteins in')
     print(f'    the {bcolors.OKBLUE}data{bcolors.ENDC} folder.')    
+    print('3 - Work with all plasmids/proteins in a multi-record')
+    print('    fasta file or a tar/zip archive.')
+    print('4 - Run blastp at ncbi for all plasmids/proteins in')
+    print(f'    the {bcolors.OKBLUE}data{bcolors.ENDC} folder that have no results yet.')
+    print('5 - Find constructs similar to a particular plasmid/protein.')
+    print('6 - Group similar constructs in the library.')
+    print(f'7 - Export the summary of the {bcolors.OKBLUE}data{bcolors.ENDC} folder')
+    print('    (.csv, .parquet or .arrow).')
+    print(f'8 - Watch the {bcolors.OKBLUE}data{bcolors.ENDC} folder and keep the table up to date.')
+    print(f'10 - Search the {bcolors.OKBLUE}data{bcolors.ENDC} folder by promoter, signal, tag, mass or pI.')
+    print('11 - Match observed intact masses (MS) to constructs.')
     print('9 - Quit.')
     print('=======================================')
     print()
@@ -44,6 +73,12 @@ def menu():
             print('Not a valid selection. Please enter an integer.')
     
 def main():
+    if sys.argv[1:2] and sys.argv[1] in COMMANDS:
+        from batch.Batch import main as batch_main
+        sys.exit(batch_main(sys.argv[1:]))
+    # python main.py --profile times each analysis stage (see README)
+    if '--profile' in sys.argv[1:]:
+        enable()
     greeting()
     root = "data/"
     plasmid_manager = Manager()
@@ -53,17 +88,64 @@ def main():
             plasmid_manager.create_object(root)
             plasmid_manager.print_object()
         if selection == 2:
-            plasmid_manager.create_all_objects(root)
+            plasmid_manager.create_all_objects(root, workers=os.cpu_count())
+            plasmid_manager.update_library_index(root)
             # for plasmid in plasmid_manager.plasmids_list:
             #     print(plasmid)
             plasmid_manager.prepare_for_pandas(plasmid_manager.plasmids_list)
-            # for plasmid in plasmid_manager.pandas_list:
-            #     print(plasmid)
-            plasmid_manager.create_df()
 #            print(plasmid_manager.plasmids_df)
-            plasmid_manager.create_table()
+            plasmid_manager.show_table()
+        elif selection == 3:
+            source = input('Path to fasta file or archive: ').strip()
+            if not os.path.isfile(source):
+                print(f'{source} not found.')
+                input('Press Enter to continue...')
+                continue
+            plasmid_manager.create_objects_from_file(source, workers=os.cpu_count())
+            plasmid_manager.prepare_for_pandas(plasmid_manager.plasmids_list)
+            plasmid_manager.show_table()
+        elif selection == 4:
+            plasmid_manager.create_all_objects(root, workers=os.cpu_count())
+            print('\nRunning remote blastp; this can take a long time.')
+            print('If interrupted, choose 4 again to resume.\n')
+            failed = plasmid_manager.blast_all_objects(root)
+            if failed:
+                print(f'{failed} blastp searches failed.')
+            input('\nPress Enter to continue...')
+        elif selection == 5:
+            plasmid_manager.create_all_objects(root, workers=os.cpu_count())
+            plasmid_manager.update_similarity_index()
+            plasmid_manager.create_object(root)
+            plasmid_manager.print_similar()
+            input('\nPress Enter to continue...')
+        elif selection == 6:
+            plasmid_manager.create_all_objects(root, workers=os.cpu_count())
+            plasmid_manager.update_similarity_index()
+            plasmid_manager.print_clusters()
+            input('\nPress Enter to continue...')
+        elif selection == 7:
+            out_file = input('Output file (.csv, .parquet or .arrow): ').strip()
+            plasmid_manager.create_all_objects(root, workers=os.cpu_count())
+            plasmid_manager.prepare_for_pandas(plasmid_manager.plasmids_list)
+            try:
+                plasmid_manager.export_summary(out_file)
+            except (ValueError, ImportError, OSError) as error:
+                print(error)
+            input('\nPress Enter to continue...')
+        elif selection == 8:
+            plasmid_manager.watch(root, workers=os.cpu_count())
+            input('\nPress Enter to continue...')
+        elif selection == 10:
+            plasmid_manager.query_library(root, workers=os.cpu_count())
+            input('\nPress Enter to continue...')
+        elif selection == 11:
+            plasmid_manager.create_all_objects(root, workers=os.cpu_count())
+            plasmid_manager.match_masses()
+            input('\nPress Enter to continue...')
         elif selection == 9:
             goodbye()
+            if enabled():
+                write_profile()
             break
         else:
             print('Not a valid choice. Please try again.')
@@ -1,11 +1,27 @@
 import os
 import re
-import pandas as pd
-from great_tables import GT, style, loc, md
+import time
+from collections import deque
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
 from bcolors.bcolors import bcolors
+from cache.Cache import Cache
+from fasta.Fasta import read_fasta, read_records
+from similarity.Similarity import KmerIndex
+from profiling.Profiling import PROFILER, stage, enabled, run_profiled
+from memo.Memo import MEMO, open_store
 from plasmid.Plasmid import Plasmid
 from plasmid.Plasmid import NotPichia
 
+# Summary columns shown in the great-tables table
+TABLE_COLUMNS = ['plasmid', 'promoter', 'SSS', 'tag', 'kDa', 'pI', 'top hit', 'organism']
+# Where watch mode keeps the rendered table
+WATCH_TABLE = 'komagataella_table.html'
+# Libraries with more rows than this get the paginated table, written
+# to TABLE_PAGES, instead of one great-tables page
+LARGE_TABLE = 1000
+TABLE_PAGES = 'komagataella_table'
+
 class Manager():
 
     def __init__(self):
@@ -20,9 +36,14 @@ class Manager():
         # List is for analysis of all plasmids in the library. Plasmid
         # objects are created and inserted
         self.plasmids_list = []
-        # A list of lists that assembles data needed for pandas df
-        # from the plasmid objects. Used to create great-tables table.
-        self.pandas_list = []
+        # Columnar summary of the plasmid objects. Used to create the
+        # pandas df for the great-tables table, and for export.
+        self.summary = None
+        # k-mer index over the mature proteins in plasmids_list, for
+        # finding similar constructs without blast
+        self.similarity_index = KmerIndex()
+        # Watch mode: folder name -> (chosen fasta file, Plasmid or None)
+        self.watched = {}
 
     def create_object(self, root):
         '''
@@ -76,49 +97,478 @@ class Manager():
             else:
                 print("Please choose 'Y' or 'N'")
 
-    def create_all_objects(self, root):
+    def create_all_objects(self, root, workers=1, cache=True, interactive=True,
+                           progress=None):
         '''
         Creates Plasmid objects for the entire database in root folder.
+        When workers is greater than 1, the folders are analyzed in a
+        process pool. Either way, plasmids_list keeps the folder order.
+        With cache, results for unchanged files are read from the cache
+        file in root and only new or changed files are analyzed.
+        Plasmid objects are kept in compact form, without the full DNA.
+        Unless interactive, the screen is not cleared, nothing is asked
+        and each fasta file is picked with choose_fasta; progress, if
+        given, is called as progress(event, **fields) along the way.
         '''
         # Reset the list, in case it was used previously
         self.plasmids_list = []
-        self.pandas_list = []
-        folders = get_folders(root)
-        print(folders)
-        for folder in folders:
-            fasta_file = select_file_automatic(f'{root}{folder}')
-            if not fasta_file:
+        self.summary = None
+        with stage('manager.get_folders'):
+            folders = get_folders(root, clear=interactive)
+        if interactive:
+            print(folders)
+        elif progress:
+            progress('folders', total=len(folders))
+        # Choose the fasta files first. This may prompt the user, so it
+        # always happens in the main process.
+        paths = []
+        chosen_files = []
+        with stage('manager.select_files'):
+            for folder in folders:
+                if interactive:
+                    fasta_file = select_file_automatic(f'{root}{folder}')
+                else:
+                    fasta_file, candidates = choose_fasta(f'{root}{folder}')
+                    if progress and len(candidates) != 1:
+                        progress('choice', folder=folder, chosen=fasta_file,
+                                 candidates=candidates)
+                if not fasta_file:
+                    continue
+                paths.append(f'{root}{folder}')
+                chosen_files.append(f'{root}{folder}/{fasta_file}')
+        results = self.analyze_files(paths, chosen_files, workers,
+                                     Cache(root) if cache else None,
+                                     memo_store=open_store(root) if cache else None,
+                                     progress=progress)
+        for oPlasmid in results:
+            # None means the file is not a pichia expression plasmid
+            if oPlasmid is not None:
+                self.plasmids_list.append(oPlasmid)
+
+    def analyze_files(self, paths, chosen_files, workers=1, analysis_cache=None,
+                      keep=(), memo_store=None, progress=None):
+        '''
+        Returns a list with a Plasmid object, or None for files that are
+        not pichia expression plasmids, for each of chosen_files. Results
+        for unchanged files are read from analysis_cache, if given; keep
+        lists other files whose cache entries should be kept. memo_store
+        is the persistent tier of the insert memo for this run. progress,
+        if given, gets an 'analyzed' event as each file is done.
+        '''
+        results = [None] * len(paths)
+        todo = []
+        with stage('manager.cache_lookup'):
+            for idx, chosen_file in enumerate(chosen_files):
+                if analysis_cache:
+                    found, results[idx] = analysis_cache.lookup(chosen_file)
+                    if found:
+                        continue
+                todo.append(idx)
+        todo_paths = [paths[idx] for idx in todo]
+        todo_files = [chosen_files[idx] for idx in todo]
+        if progress:
+            progress('cached', cached=len(paths) - len(todo), todo=len(todo))
+            done = [0]
+            def report(oPlasmid):
+                done[0] += 1
+                progress('analyzed', done=done[0], total=len(todo),
+                         file=todo_files[done[0] - 1], pichia=oPlasmid is not None)
+                return oPlasmid
+        else:
+            report = None
+        try:
+            with stage('manager.analyze'):
+                if workers > 1 and len(todo) > 1:
+                    chunksize = max(1, len(todo) // (workers * 4))
+                    # Workers keep their own in-memory memo; the store
+                    # is attached afterwards so its connection is not
+                    # shared with forked processes
+                    with ProcessPoolExecutor(max_workers=workers) as executor:
+                        analyzed = pool_map(executor, analyze_fasta, todo_paths,
+                                            todo_files, repeat(False), repeat(True),
+                                            chunksize=chunksize, callback=report)
+                    MEMO.attach(memo_store)
+                else:
+                    MEMO.attach(memo_store)
+                    analyzed = map(analyze_fasta, todo_paths, todo_files,
+                                   repeat(False), repeat(True))
+                    analyzed = list(map(report, analyzed) if report else analyzed)
+            # Mass, pI and tag for all new proteins in one vectorized pass
+            with stage('manager.characterize'):
+                from composition.Composition import characterize_proteins
+                characterize_proteins([oPlasmid.protein for oPlasmid in analyzed
+                                       if oPlasmid is not None])
+        finally:
+            MEMO.detach()
+        if progress:
+            progress('memo', **{table: dict(zip(('memory', 'stored', 'missed'), counts))
+                                for table, counts in sorted(MEMO.counts.items())})
+        else:
+            MEMO.report()
+        MEMO.drain_counts()
+        for idx, oPlasmid in zip(todo, analyzed):
+            results[idx] = oPlasmid
+            if analysis_cache:
+                analysis_cache.store(chosen_files[idx], oPlasmid)
+        if analysis_cache:
+            analysis_cache.keep(keep)
+            with stage('manager.cache_save'):
+                analysis_cache.save()
+        return results
+
+    def create_objects_from_file(self, source, workers=1):
+        '''
+        Creates Plasmid objects for every record in a multi-record fasta
+        file, a gzip/bz2 compressed fasta file, or a tar/zip archive of
+        fasta files. Records are streamed, so an archive does not have to
+        be unpacked into folders first. Plasmid objects are kept in
+        compact form, without the full DNA. Records after the first of a
+        file are named with record_names, so each has its own blast file
+        and similarity key.
+        '''
+        # Reset the list, in case it was used previously
+        self.plasmids_list = []
+        self.summary = None
+        path = os.path.dirname(source) or '.'
+        records = record_names(read_records(source))
+        argument_tuples = ((path, name, header, sequence, False, True)
+                           for name, header, sequence in records)
+        with stage('manager.analyze'):
+            if workers > 1:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    analyzed = bounded_map(executor, analyze_record,
+                                           argument_tuples, workers * 4)
+                    self.plasmids_list = [oPlasmid for oPlasmid in analyzed
+                                          if oPlasmid is not None]
+            else:
+                analyzed = (analyze_record(*arguments) for arguments in argument_tuples)
+                # None means the record is not a pichia expression plasmid
+                self.plasmids_list = [oPlasmid for oPlasmid in analyzed
+                                      if oPlasmid is not None]
+        # Mass, pI and tag for all proteins in one vectorized pass
+        with stage('manager.characterize'):
+            from composition.Composition import characterize_proteins
+            characterize_proteins([oPlasmid.protein for oPlasmid in self.plasmids_list])
+        MEMO.report()
+        MEMO.drain_counts()
+
+    def blast_all_objects(self, root, url=None, max_in_flight=3, rerun=False,
+                          **queue_options):
+        '''
+        Runs remote blastp for every protein in plasmids_list that does
+        not have a results file yet (or for all of them with rerun).
+        Identical proteins are searched once. The queue is kept in root,
+        so an interrupted run resumes when this is called again. Returns
+        the number of searches that failed.
+        '''
+        from blast.Queue import BlastQueue, QUEUE_NAME
+        queue = BlastQueue(os.path.join(root, QUEUE_NAME), url=url,
+                           max_in_flight=max_in_flight, **queue_options)
+        for plasmid in self.plasmids_list:
+            protein = plasmid.protein
+            if not protein.amino_acids:
                 continue
-            path = f'{root}{folder}'            
-            chosen_file = f'{root}{folder}/{fasta_file}'
-            # Open file, get header and sequence
-            header, sequence = single_fasta_parser(chosen_file)
-            # Create the object
+            blast_file_out = f'{protein.path}/{protein.fasta_file}_blast.xml'
+            if os.path.isfile(blast_file_out) and not rerun:
+                continue
+            queue.add(protein.amino_acids, blast_file_out, rerun)
+        return queue.run()
+
+    def update_similarity_index(self):
+        '''
+        Brings the k-mer index in line with plasmids_list: new or changed
+        proteins are added and proteins no longer in the list removed.
+        Proteins are indexed by fasta file, since headers may repeat.
+        '''
+        current = {similarity_key(plasmid.protein): plasmid.protein.amino_acids or ''
+                   for plasmid in self.plasmids_list}
+        for name in list(self.similarity_index.sequences):
+            if name not in current:
+                self.similarity_index.remove(name)
+        for name, sequence in current.items():
+            if self.similarity_index.sequences.get(name) != sequence:
+                self.similarity_index.add(name, sequence)
+
+    def print_similar(self, top=5, min_score=0.05):
+        '''
+        Prints the constructs in the library most similar to the protein
+        of the selected plasmid.
+        '''
+        protein = self.plasmids_dict[0].protein
+        hits = self.similarity_index.query(protein.amino_acids or '', top=top,
+                                           min_score=min_score,
+                                           exclude=similarity_key(protein))
+        headers = self.similarity_headers()
+        print(f'\nConstructs most similar to {protein.header}:\n')
+        if not hits:
+            print('No similar constructs found.')
+        for key, score, shared in hits:
+            print(f'{headers[key]:<40} {score:>6.2f} {shared:>6} shared {self.similarity_index.k}-mers')
+
+    def print_clusters(self, min_score=0.5):
+        '''
+        Prints groups of constructs whose proteins are near-duplicates or
+        variants of each other. Constructs without a match are skipped.
+        '''
+        clusters = self.similarity_index.clusters(min_score)
+        headers = self.similarity_headers()
+        print(f'\nConstructs grouped at similarity >= {min_score}:\n')
+        groups = [cluster for cluster in clusters if len(cluster) > 1]
+        if not groups:
+            print('No similar constructs found.')
+        for idx, cluster in enumerate(groups, start=1):
+            print(f'{idx:>3}. ' + ', '.join(headers[key] for key in cluster))
+
+    def similarity_headers(self):
+        '''
+        Returns a dict from similarity index key to plasmid header.
+        '''
+        return {similarity_key(plasmid.protein): plasmid.header
+                for plasmid in self.plasmids_list}
+
+    def update_library_index(self, root):
+        '''
+        Brings the SQLite library index in root in line with
+        plasmids_list. Returns False, after saying so, if the index
+        could not be written, e.g. in a read-only library folder.
+        '''
+        import sqlite3
+        from index.Index import LibraryIndex
+        try:
+            with stage('manager.update_library_index'):
+                with LibraryIndex(root) as library_index:
+                    library_index.sync(self.plasmids_list)
+        except (sqlite3.Error, OSError) as error:
+            print(f'Library index not updated ({error}).')
+            return False
+        return True
+
+    def query_library(self, root, workers=1):
+        '''
+        Asks for search criteria and prints the matching plasmids from
+        the library index. The index is built first if it is empty.
+        '''
+        from index.Index import LibraryIndex
+        with LibraryIndex(root) as library_index:
+            if not len(library_index):
+                print('Building the library index...')
+                self.create_all_objects(root, workers=workers)
+                library_index.sync(self.plasmids_list)
+            os.system('cls' if os.name == 'nt' else 'clear')
+            print(f'\nSearching {len(library_index)} plasmids. Leave blank to match anything.\n')
+            promoter = input('Promoter (aox1, gap): ').strip() or None
+            secretion = input('Secretion signal (alpha, ost1, cytoplasmic): ').strip() or None
+            tag = ask_flag('His tag (y/n): ')
+            min_kda, max_kda = ask_range('Mass in kDa (e.g. 30-60): ')
+            min_pI, max_pI = ask_range('pI (e.g. 5-7.5): ')
+            header = input('Header starts with: ').strip() or None
+            start = time.perf_counter()
+            matches = library_index.query(promoter, secretion, tag, min_kda,
+                                          max_kda, min_pI, max_pI, header)
+            elapsed = (time.perf_counter() - start) * 1000
+        print(f'\n{len(matches)} matches in {elapsed:.1f} ms\n')
+        for match in matches:
+            tag_mark = '+' if match['tag'] else ''
+            print(f"{match['header']:<40} {match['promoter']:>5} {match['secretion']:>12} "
+                  f"{tag_mark:>2} {match['mw']:>7.1f} kDa  pI {match['pI']:>4.1f}  "
+                  f"{match['description'][:30]}")
+
+    def match_masses(self, ppm=None):
+        '''
+        Asks for observed intact masses and prints the constructs, with
+        processing state and modification, that each could be.
+        '''
+        from mass.Mass import MassIndex, DEFAULT_PPM
+        with stage('manager.mass_index'):
+            mass_index = MassIndex(self.plasmids_list)
+        os.system('cls' if os.name == 'nt' else 'clear')
+        print(f'\n{len(mass_index)} masses from {len(self.plasmids_list)} constructs.\n')
+        while True:
+            answer = input('Observed masses in Da (separated by spaces or commas): ')
+            try:
+                observed = [float(value) for value in answer.replace(',', ' ').split()]
+                break
+            except ValueError:
+                print('Please enter numbers only.')
+        if ppm is None:
+            answer = input(f'Tolerance in ppm [{DEFAULT_PPM:g}]: ').strip()
             try:
-                oPlasmid = Plasmid(path, chosen_file, header, sequence)
-                self.plasmids_list.append(oPlasmid)                
-            except NotPichia:
+                ppm = float(answer) if answer else DEFAULT_PPM
+            except ValueError:
+                ppm = DEFAULT_PPM
+        for mass, matches in zip(observed, mass_index.lookup(observed, ppm)):
+            print(f'\n{mass:.2f} Da: {len(matches)} candidates within {ppm:g} ppm')
+            for header, form, theoretical, error in matches:
+                print(f'    {header:<40} {form:<36} {theoretical:>12.2f} {error:>+8.1f} ppm')
+
+    def watch(self, root, workers=1, interval=2.0, out_file=WATCH_TABLE,
+              scans=None):
+        '''
+        Watches root for plasmid folders that are added, changed or
+        removed, and re-analyzes only those. plasmids_list and the table
+        rows are updated in place and the table is rewritten to out_file
+        after each change. Stops after scans scans, or on Ctrl-C.
+        '''
+        from watch.Watch import take_snapshot, diff_snapshots
+        self.watched = {}
+        self.plasmids_df = None
+        snapshot = {}
+        scan = 0
+        print(f'Watching {root}; press Ctrl-C to stop.')
+        try:
+            while scans is None or scan < scans:
+                if scan:
+                    time.sleep(interval)
+                scan += 1
+                new_snapshot = take_snapshot(root)
+                added, changed, removed = diff_snapshots(snapshot, new_snapshot)
+                snapshot = new_snapshot
+                if not (added or changed or removed):
+                    continue
+                self.update_folders(root, added + changed, removed, workers)
+                self.update_library_index(root)
+                if len(self.plasmids_list) > LARGE_TABLE:
+                    self.prepare_for_pandas(self.plasmids_list)
+                    written = self.write_table()
+                else:
+                    self.create_table(show=False)
+                    self.table.write_raw_html(out_file, make_page=True)
+                    written = out_file
+                print(f"{time.strftime('%H:%M:%S')}  {len(added)} added, "
+                      f"{len(changed)} changed, {len(removed)} removed; "
+                      f"{len(self.plasmids_list)} plasmids in {written}")
+        except KeyboardInterrupt:
+            print('\nStopped watching.')
+
+    def update_folders(self, root, folders, removed, workers=1):
+        '''
+        Re-analyzes the given folders, forgets the removed ones, and
+        updates plasmids_list and the rows of plasmids_df to match.
+        Other folders are left untouched.
+        '''
+        for folder in removed:
+            self.watched.pop(folder, None)
+        paths = []
+        chosen_files = []
+        analyzed_folders = []
+        for folder in folders:
+            # Chosen as summarize and shard do, without prompting, so an
+            # unattended watch does not stop at a folder
+            fasta_file, candidates = choose_fasta(f'{root}{folder}')
+            if len(candidates) > 1:
+                print(f"{folder}: chose {fasta_file} of {', '.join(candidates)}")
+            if not fasta_file:
+                print(f'{folder}: no fasta file')
+                self.watched.pop(folder, None)
                 continue
+            paths.append(f'{root}{folder}')
+            chosen_files.append(f'{root}{folder}/{fasta_file}')
+            analyzed_folders.append(folder)
+        keep = [chosen_file for chosen_file, _ in self.watched.values()]
+        results = self.analyze_files(paths, chosen_files, workers,
+                                     Cache(root), keep, open_store(root))
+        for folder, chosen_file, oPlasmid in zip(analyzed_folders, chosen_files,
+                                                 results):
+            self.watched[folder] = (chosen_file, oPlasmid)
+        # None means the file is not a pichia expression plasmid
+        self.plasmids_list = [self.watched[folder][1] for folder in sorted(self.watched)
+                              if self.watched[folder][1] is not None]
+        self.summary = None
+        updated = {folder: oPlasmid for folder, oPlasmid
+                   in zip(analyzed_folders, results) if oPlasmid is not None}
+        self.update_rows(updated, list(folders) + list(removed))
 
+    def update_rows(self, updated, dropped):
+        '''
+        Drops the plasmids_df rows of the dropped folders, then adds rows
+        for the updated folders (a dict of folder -> Plasmid). Rows are
+        indexed and ordered by folder name.
+        '''
+        import pandas as pd
+        from summary.Summary import Summary
+        frame = table_frame(Summary(list(updated.values())))
+        frame.index = list(updated)
+        if self.plasmids_df is not None:
+            kept = self.plasmids_df.drop(index=dropped, errors='ignore')
+            if len(frame) == 0:
+                frame = kept
+            elif len(kept):
+                frame = pd.concat([kept, frame])
+        self.plasmids_df = frame.sort_index()
+
+    def merge_shards(self, manifest_file, partial_files):
+        '''
+        Sets the summary to the merged partial summaries of a sharded run
+        (see shard.Shard), ready for show_table or create_table.
+        '''
+        from shard.Shard import merge
+        self.plasmids_list = []
+        with stage('manager.merge_shards'):
+            self.summary = merge(manifest_file, partial_files)
 
     def prepare_for_pandas(self, chosen_list):
-        self.pandas_list = []    # Clear any previous list
-        for plasmid in chosen_list:
-            if plasmid.protein.tag:
-                tag = '+'
-            else:
-                tag = ''
-            self.pandas_list.append([plasmid.header, plasmid.promoter, plasmid.secretion, tag, plasmid.protein.mw, plasmid.protein.pI])
+        '''
+        Collects the summary columns for chosen_list.
+        '''
+        from summary.Summary import Summary
+        with stage('manager.prepare_for_pandas'):
+            self.summary = Summary(chosen_list)
         return
 
     def create_df(self):
-        self.plasmids_df = pd.DataFrame(self.pandas_list, columns=['plasmid', 'promoter', 'SSS', 'tag', 'kDa', 'pI'])
+        with stage('manager.create_df'):
+            self.plasmids_df = table_frame(self.summary)
         return
 
+    def export_summary(self, out_file):
+        '''
+        Writes the summary to out_file as CSV, Parquet or Arrow IPC,
+        chosen by the file extension.
+        '''
+        self.summary.write(out_file)
+        print(f'Wrote {len(self.summary)} rows to {out_file}')
 
-    def create_table(self):
+
+    def show_table(self):
+        '''
+        Opens the great-tables table of the summary in the browser. Large
+        libraries are written as a paginated table instead, without
+        building the pandas df.
+        '''
+        if len(self.summary) > LARGE_TABLE:
+            index_file = self.write_table()
+            print(f'\n{len(self.summary)} plasmids; open {index_file} in a browser.')
+            input('\nPress Enter to continue...')
+            return
+        self.create_df()
+        self.create_table()
+
+    def write_table(self, out_dir=TABLE_PAGES, page_size=None):
+        '''
+        Writes the summary as HTML pages in out_dir and returns the path
+        of their index page.
+        '''
+        from table.Table import write_pages, PAGE_SIZE
+        with stage('manager.write_table'):
+            return write_pages(self.summary, out_dir, page_size or PAGE_SIZE)
+
+    def create_table(self, show=True):
+        '''
+        Builds the great-tables table from plasmids_df and opens it in
+        the browser unless show is False.
+        '''
+        with stage('manager.create_table'):
+            self.build_table()
+        if show:
+            self.table.show()
+
+    def build_table(self):
+        '''
+        Builds the great-tables table from plasmids_df.
+        '''
+        from great_tables import GT, style, loc, md
         self.table = (
-            GT(self.plasmids_df, rowname_col='plasmid')
+            GT(self.plasmids_df.reset_index(drop=True), rowname_col='plasmid')
             .tab_header(
                 title=md('**Expression Plasmids**'),
             )
@@ -162,7 +612,6 @@ class Manager():
             )
 #        .opt_stylize(style=1)# color='blue') 6,3,1
         )
-        self.table.show()
     
             
 
@@ -250,30 +699,183 @@ def select_file_automatic(root_directory):
     return fasta_files[file_choice]
 
 
+def choose_fasta(root_directory):
+    '''
+    Non-interactive counterpart of select_file_automatic. Returns
+    (chosen file, all fasta files in sorted order); chosen is None if
+    there are none. When there are several, the one named after the
+    folder (pTAN121.fa in pTAN121/) wins, then .fa over .fasta, then the
+    first by name, so the same folder always gives the same choice.
+    '''
+    folder = os.path.basename(os.path.normpath(root_directory))
+    fasta_files = sorted(file for file in os.listdir(root_directory)
+                         if file.endswith('fa') or file.endswith('fasta'))
+    if not fasta_files:
+        return None, fasta_files
+    def rank(file):
+        stem, extension = os.path.splitext(file)
+        return (stem != folder, extension != '.fa', file)
+    return min(fasta_files, key=rank), fasta_files
+
+
 def single_fasta_parser(fasta_file):
     '''
-    Opens a file with a single fasta sequence, parses the header and
-    sequence, then returns both as strings.
+    Opens a fasta file, parses the header and sequence of the first
+    record, then returns both as strings.
     '''
-    sequence = ''
-    with open(fasta_file, 'rt', encoding='utf-8') as fastafile:
-        first_line = fastafile.readline().rstrip()
-        header = first_line[1:]
-        for line in fastafile.readlines():
-            sequence = sequence + line.rstrip()
-    return (header, sequence)
+    return next(read_fasta(fasta_file), ('', ''))
 
-def get_folders(root_directory):
+def analyze_fasta(path, chosen_file, characterize=True, compact=False):
+    '''
+    Parses a fasta file and returns the Plasmid object, or None if it
+    is not a pichia expression plasmid. Defined at module level so that
+    it can be sent to worker processes.
+    '''
+    # Open file, get header and sequence
+    with stage('fasta.parse', chosen_file):
+        header, sequence = single_fasta_parser(chosen_file)
+    return analyze_record(path, os.path.basename(chosen_file), header,
+                          sequence, characterize, compact)
+
+def analyze_record(path, fasta_file, header, sequence, characterize=True,
+                   compact=False):
+    '''
+    Returns the Plasmid object for a single fasta record, or None if it
+    is not a pichia expression plasmid. The top blastp hit is loaded
+    when a results file exists. With characterize=False, protein mass,
+    pI and tag are left for characterize_proteins. With compact=True,
+    the full plasmid DNA is not kept.
+    '''
+    # Create the object
+    try:
+        with stage('manager.analyze_record', f'{path}/{fasta_file}'):
+            oPlasmid = Plasmid(path, fasta_file, header, sequence, characterize,
+                               compact)
+    except NotPichia:
+        return None
+    if os.path.isfile(f'{path}/{fasta_file}_blast.xml'):
+        oPlasmid.protein.parse_blast()
+    return oPlasmid
+
+def record_names(records):
+    '''
+    Yields (name, header, sequence) for each (name, header, sequence) in
+    records, with the names made unique: the first record of a file
+    keeps its name and the nth after it is named {name}_{n + 1}.
+    '''
+    seen = {}
+    for name, header, sequence in records:
+        seen[name] = seen.get(name, 0) + 1
+        yield (name if seen[name] == 1 else f'{name}_{seen[name]}', header, sequence)
+
+def similarity_key(protein):
+    '''
+    Returns the key of a protein in the similarity index: the path of
+    the fasta file it came from.
+    '''
+    return f'{protein.path}/{protein.fasta_file}'
+
+def bounded_map(executor, function, argument_tuples, window):
+    '''
+    Like executor.map, but reads argument_tuples lazily and keeps at most
+    window tasks in flight. Results are yielded in input order.
+    '''
+    profiled = enabled()
+    pending = deque()
+    for arguments in argument_tuples:
+        pending.append(executor.submit(run_worker, profiled, function, *arguments))
+        if len(pending) >= window:
+            yield worker_result(pending.popleft().result())
+    while pending:
+        yield worker_result(pending.popleft().result())
+
+def pool_map(executor, function, *iterables, chunksize=1, callback=None):
+    '''
+    Returns list(executor.map(...)), with the memo counts and profiling
+    timings of the worker processes merged into this one. callback, if
+    given, is called with each result as it arrives, in input order.
+    '''
+    results = (worker_result(result) for result in
+               executor.map(run_worker, repeat(enabled()), repeat(function),
+                            *iterables, chunksize=chunksize))
+    return list(map(callback, results) if callback else results)
+
+def run_worker(profiled, function, *args):
+    '''
+    Calls function(*args) in a worker process. Returns the result with
+    the worker's insert memo counts and, if profiled, its timings.
+    '''
+    if profiled:
+        result, snapshot = run_profiled(function, *args)
+    else:
+        result, snapshot = function(*args), None
+    return result, MEMO.drain_counts(), snapshot
+
+def worker_result(worker_output):
+    '''
+    Unpacks a run_worker result, merging its counts and timings, and
+    returns the plain result.
+    '''
+    result, counts, snapshot = worker_output
+    MEMO.merge_counts(counts)
+    if snapshot is not None:
+        PROFILER.merge(snapshot)
+    return result
+
+def ask_flag(prompt):
+    '''
+    Asks a yes/no question. Returns True, False, or None if left blank.
+    '''
+    while True:
+        answer = input(prompt).strip().lower()
+        if not answer:
+            return None
+        if answer in ('y', 'n'):
+            return answer == 'y'
+        print("Please choose 'y', 'n' or leave blank.")
+
+def ask_range(prompt):
+    '''
+    Asks for a range written as 'low-high', 'low-' or '-high'. Returns
+    (low, high), with None for an open end.
+    '''
+    while True:
+        answer = input(prompt).strip()
+        if not answer:
+            return None, None
+        low, dash, high = answer.partition('-')
+        try:
+            low = float(low) if low.strip() else None
+            high = float(high) if high.strip() else None
+        except ValueError:
+            print('Please enter a range such as 30-60.')
+            continue
+        if not dash:
+            # A single number matches that value only
+            high = low
+        return low, high
+
+def table_frame(summary):
+    '''
+    Returns the pandas DataFrame shown in the table: TABLE_COLUMNS of
+    summary, with the His tag flag shown as '+'.
+    '''
+    plasmids_df = summary.to_pandas()[TABLE_COLUMNS]
+    return plasmids_df.assign(tag=plasmids_df['tag'].map({True: '+', False: ''}))
+
+def get_folders(root_directory, clear=True):
     '''
     Given root folder with plasmid files, returns a list of plasmid 
-    folders named pTAN___.
+    folders named pTAN___. With clear, the screen is cleared and the
+    folder announced first.
     '''
-    # Prepare to print at the top of the page
-    os.system('cls' if os.name == 'nt' else 'clear')
+    if clear:
+        # Prepare to print at the top of the page
+        os.system('cls' if os.name == 'nt' else 'clear')
 #    pTAN_finder = re.compile(r'^pTAN\d{3}')
-    print()
-    print(f'Entering {root_directory}')
-    print()
+        print()
+        print(f'Entering {root_directory}')
+        print()
     walker = os.walk(root_directory)
     root_dirs_files = next(walker)
     subfolders = []
@@ -0,0 +1,117 @@
+import numpy as np
+from protein.Protein import MASS_DICT, UNKNOWN_MASS, HIS_TAG
+
+# Monoisotopic mass changes, in Da
+OXIDATION = 15.994915
+DISULFIDE = -2.015650
+PYROGLU_FROM_Q = -17.026549
+PYROGLU_FROM_E = -18.010565
+EA_REPEAT = MASS_DICT['E'] + MASS_DICT['A']
+DEFAULT_PPM = 20.0
+
+
+def his_trimmed(sequence):
+    '''
+    Returns the part of sequence before its C-terminal His tag (the
+    last run of at least six His), or None if there is no tag.
+    '''
+    start = sequence.rfind(HIS_TAG)
+    if start == -1:
+        return None
+    while start > 0 and sequence[start - 1] == 'H':
+        start -= 1
+    return sequence[:start]
+
+
+def residue_mass(residues):
+    '''
+    Returns the summed residue masses of residues, in Da. Unknown
+    residues, such as X from ambiguous codons, weigh UNKNOWN_MASS, as in
+    Protein.mw and composition.Composition.
+    '''
+    return sum(MASS_DICT.get(residue, UNKNOWN_MASS) for residue in residues)
+
+
+def processing_states(sequence, secretion, mass):
+    '''
+    Yields (state, sequence, mass in Da) for the processed forms a
+    construct may be observed in: the expected mature protein, the form
+    with the His tag trimmed off, EA or EAEA left on by incomplete Ste13
+    processing of secreted proteins, and the initiator Met removed from
+    cytoplasmic proteins.
+    '''
+    yield 'mature', sequence, mass
+    trimmed = his_trimmed(sequence)
+    if trimmed:
+        yield 'His tag trimmed', trimmed, mass - residue_mass(sequence[len(trimmed):])
+    if secretion in ('alpha', 'ost1'):
+        yield 'EA retained', 'EA' + sequence, mass + EA_REPEAT
+        yield 'EAEA retained', 'EAEA' + sequence, mass + 2 * EA_REPEAT
+    elif sequence.startswith('M') and len(sequence) > 1:
+        yield 'Met removed', sequence[1:], mass - MASS_DICT['M']
+
+
+def modifications(sequence):
+    '''
+    Yields (modification, mass change in Da) for the common
+    modifications that sequence can carry, starting with none.
+    '''
+    yield '', 0.0
+    if 'M' in sequence:
+        yield 'Met oxidation', OXIDATION
+    bonds = sequence.count('C') // 2
+    if bonds:
+        yield f'{bonds} disulfides', bonds * DISULFIDE
+    if sequence.startswith('Q'):
+        yield 'pyroGlu', PYROGLU_FROM_Q
+    elif sequence.startswith('E'):
+        yield 'pyroGlu', PYROGLU_FROM_E
+
+
+class MassIndex():
+    '''
+    Sorted index of the intact masses of every construct's protein, in
+    each processing state and with each common modification. Observed
+    masses are matched with binary searches, all of a batch at once.
+    '''
+    def __init__(self, plasmids):
+        headers = []
+        labels = []
+        masses = []
+        for oPlasmid in plasmids:
+            protein = oPlasmid.protein
+            if not protein.amino_acids or protein.mw is None:
+                continue
+            # Protein.mw is in kDa
+            for state, sequence, mass in processing_states(
+                    protein.amino_acids, oPlasmid.secretion, protein.mw * 1000):
+                for modification, delta in modifications(sequence):
+                    headers.append(oPlasmid.header)
+                    labels.append(f'{state}, {modification}' if modification else state)
+                    masses.append(mass + delta)
+        order = np.argsort(masses, kind='stable')
+        self.masses = np.asarray(masses, dtype=np.float64)[order]
+        self.headers = [headers[idx] for idx in order.tolist()]
+        self.labels = [labels[idx] for idx in order.tolist()]
+
+    def __len__(self):
+        return len(self.masses)
+
+    def lookup(self, observed, ppm=DEFAULT_PPM):
+        '''
+        Returns, for each observed mass in Da, a list of (header, form,
+        theoretical mass, error in ppm) within ppm, closest first.
+        '''
+        observed = np.asarray(observed, dtype=np.float64)
+        tolerance = observed * ppm / 1e6
+        lows = np.searchsorted(self.masses, observed - tolerance, side='left')
+        highs = np.searchsorted(self.masses, observed + tolerance, side='right')
+        results = []
+        for mass, low, high in zip(observed.tolist(), lows.tolist(), highs.tolist()):
+            theoretical = self.masses[low:high].tolist()
+            matches = [(self.headers[idx], self.labels[idx], value,
+                        (mass - value) / value * 1e6)
+                       for idx, value in zip(range(low, high), theoretical)]
+            matches.sort(key=lambda match: abs(match[3]))
+            results.append(matches)
+        return results
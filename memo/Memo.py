@@ -0,0 +1,239 @@
+import os
+import json
+import hashlib
+import sqlite3
+from collections import OrderedDict
+
+# Results kept in memory per process; the least recently used are
+# dropped first
+MAX_ENTRIES = 4096
+MEMO_NAME = '.komagataella_memo.sqlite'
+# Rows buffered before they are written to the persistent store
+FLUSH_EVERY = 1000
+# Tables kept in the persistent store. Translations are cheaper to
+# redo than to write to disk, so they stay in memory only.
+PERSISTENT_TABLES = ('protein',)
+
+
+def content_key(sequence):
+    '''
+    Returns the hex digest that identifies sequence. Keys are kept
+    instead of the sequences, so whole coding regions are not held in
+    memory or on disk just to be compared.
+    '''
+    return hashlib.blake2b(sequence.encode('ascii', 'replace'),
+                           digest_size=16).hexdigest()
+
+
+class MemoStore():
+    '''
+    Persistent tier for InsertMemo: an SQLite table of (table, key) ->
+    JSON value in root. The store is emptied when the analysis code
+    changes.
+    '''
+    def __init__(self, root):
+        # Imported here; cache imports Plasmid, which uses this module
+        from cache.Cache import analysis_version
+        self.memo_file = os.path.join(root, MEMO_NAME)
+        self.connection = sqlite3.connect(self.memo_file)
+        self.connection.executescript('''
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS memo (
+                tbl TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,
+                PRIMARY KEY (tbl, key)) WITHOUT ROWID;
+        ''')
+        version = analysis_version()
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or row[0] != version:
+            with self.connection:
+                self.connection.execute('DELETE FROM memo')
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO meta VALUES ('version', ?)", (version,))
+        # Known keys are loaded up front so that misses, the common case
+        # for a new library, do not touch the database
+        self.keys = set(self.connection.execute('SELECT tbl, key FROM memo'))
+        self.pending = []
+        self.writable = True
+
+    def get(self, table, key):
+        '''
+        Returns (found, value) for key in table.
+        '''
+        if (table, key) not in self.keys:
+            return False, None
+        row = self.connection.execute('SELECT value FROM memo WHERE tbl = ? AND key = ?',
+                                      (table, key)).fetchone()
+        if row is None:
+            return False, None
+        return True, json.loads(row[0])
+
+    def put(self, table, key, value):
+        '''
+        Queues value to be written for key in table.
+        '''
+        if not self.writable:
+            return
+        self.keys.add((table, key))
+        self.pending.append((table, key, json.dumps(value)))
+        if len(self.pending) >= FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        '''
+        Writes the queued values.
+        '''
+        if self.pending:
+            try:
+                with self.connection:
+                    self.connection.executemany('INSERT OR REPLACE INTO memo VALUES (?, ?, ?)',
+                                                self.pending)
+            except sqlite3.Error as error:
+                # Values stay in the in-memory tier; a store that cannot
+                # be written is not tried again
+                print(f'Insert memo not saved ({error}).')
+                self.writable = False
+            self.pending = []
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+
+def open_store(root):
+    '''
+    Returns the MemoStore in root, or None, after saying so, if it
+    cannot be opened, e.g. in a read-only library folder. The memo then
+    works from memory only.
+    '''
+    try:
+        return MemoStore(root)
+    except (sqlite3.Error, OSError) as error:
+        print(f'Insert memo kept in memory only ({error}).')
+        return None
+
+
+class InsertMemo():
+    '''
+    Content-addressed memo of per-insert results, such as the
+    translation of a coding sequence or the mass, tag and pI of a mature
+    protein. Results are found by a hash of the sequence, so identical
+    inserts in different plasmids are computed once. A bounded LRU is
+    kept in memory, with an optional MemoStore behind it. Hits and
+    misses are counted per table.
+    '''
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.store = None
+        # table -> [memory hits, store hits, misses]
+        self.counts = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def count(self, table, memory=0, stored=0, missed=0):
+        '''
+        Adds to the hit and miss counts of table.
+        '''
+        counts = self.counts.setdefault(table, [0, 0, 0])
+        counts[0] += memory
+        counts[1] += stored
+        counts[2] += missed
+
+    def key(self, table, sequence):
+        '''
+        Returns the memo key of sequence in table.
+        '''
+        return (table, content_key(sequence))
+
+    def lookup(self, key):
+        '''
+        Returns (found, value) for a key from key().
+        '''
+        table = key[0]
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.count(table, memory=1)
+            return True, self.entries[key]
+        if self.store is not None and table in PERSISTENT_TABLES:
+            found, value = self.store.get(*key)
+            if found:
+                self.keep(key, value)
+                self.count(table, stored=1)
+                return True, value
+        self.count(table, missed=1)
+        return False, None
+
+    def remember(self, key, value):
+        '''
+        Stores value for a key from key().
+        '''
+        self.keep(key, value)
+        if self.store is not None and key[0] in PERSISTENT_TABLES:
+            self.store.put(*key, value)
+
+    def keep(self, key, value):
+        '''
+        Adds key to the in-memory LRU, dropping the oldest entry if full.
+        '''
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def get(self, table, sequence, compute):
+        '''
+        Returns the value for sequence in table, calling compute(sequence)
+        and remembering the result if it is not known yet.
+        '''
+        key = self.key(table, sequence)
+        found, value = self.lookup(key)
+        if not found:
+            value = compute(sequence)
+            self.remember(key, value)
+        return value
+
+    def attach(self, store):
+        '''
+        Uses store as the persistent tier until detach() is called.
+        '''
+        self.store = store
+
+    def detach(self):
+        '''
+        Flushes and closes the persistent tier, if any.
+        '''
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    def drain_counts(self):
+        '''
+        Returns the hit and miss counts and resets them.
+        '''
+        counts = self.counts
+        self.counts = {}
+        return counts
+
+    def merge_counts(self, counts):
+        '''
+        Adds counts from drain_counts(), e.g. from a worker process.
+        '''
+        for table, (memory, stored, missed) in counts.items():
+            self.count(table, memory, stored, missed)
+
+    def report(self):
+        '''
+        Prints the hit rate of each table.
+        '''
+        for table, (memory, stored, missed) in sorted(self.counts.items()):
+            lookups = memory + stored + missed
+            if not lookups:
+                continue
+            hits = memory + stored
+            print(f'{table} memo: {hits}/{lookups} hits ({100 * hits / lookups:.1f}%), '
+                  f'{stored} from disk')
+
+
+MEMO = InsertMemo()
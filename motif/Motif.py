@@ -0,0 +1,172 @@
+# Backbone motifs. Each entry is checked in order, so the first match
+# wins. New backbones only need a new entry here.
+
+# name: (start anchor, bases between anchors, end anchor)
+PROMOTERS = {
+    'aox1': ('AGATCTAACATC', 916, 'TTATTCGAAACG'),
+    'gap': ('AGATCTTTTTTG', 459, 'TTGAACAACTAT'),
+}
+
+# promoter: (anchor before the coding region, anchor after it)
+CASSETTES = {
+    'aox1': ('TTATTCGAAACG', 'GTTTGTAGCCTT'),
+    'gap': ('TATTTCGAAACG', 'GTTTTAGCCTTA'),
+}
+
+# secretion signal: (signal start anchor, Kex2/Ste13 site anchor)
+SIGNALS = {
+    'alpha': ('ATGAGATTTCCT', 'GAGGCTGAAGCT'),
+    'ost1': ('ATGAGGCAGGTT', 'GAGGCTGAAGCT'),
+}
+
+# Complement of each IUPAC base, for reading the other strand
+COMPLEMENT = str.maketrans('ACGTRYKMSWBDHVNacgtrykmswbdhvn',
+                           'TGCAYRMKSWVHDBNtgcayrmkswvhdbn')
+
+
+class MotifIndex():
+    '''
+    Finds backbone anchors in a plasmid sequence. Each anchor is located
+    at most once per direction with str.find/str.rfind and remembered,
+    so anchors shared between motifs (the aox1 promoter end and cassette
+    start, the alpha and ost1 processing site) are not searched again.
+    Promoter, coding region and secretion signal are derived from the
+    anchor positions without regex backtracking.
+    '''
+    __slots__ = ('DNA', 'first_positions', 'last_positions')
+
+    def __init__(self, DNA):
+        self.DNA = DNA
+        self.first_positions = {}
+        self.last_positions = {}
+
+    def first(self, anchor):
+        '''
+        Returns the position of the first occurrence of anchor, or -1.
+        '''
+        if anchor not in self.first_positions:
+            self.first_positions[anchor] = self.DNA.find(anchor)
+        return self.first_positions[anchor]
+
+    def last(self, anchor):
+        '''
+        Returns the position of the last occurrence of anchor, or -1.
+        '''
+        if anchor not in self.last_positions:
+            self.last_positions[anchor] = self.DNA.rfind(anchor)
+        return self.last_positions[anchor]
+
+    def spans(self, start_anchor, end_anchor):
+        '''
+        Returns (start, end) of the longest region that follows the first
+        start_anchor and precedes the last end_anchor, or None. This is
+        what re.search(start_anchor + '(.*)' + end_anchor) matches.
+        '''
+        start = self.first(start_anchor)
+        if start == -1:
+            return None
+        start += len(start_anchor)
+        end = self.last(end_anchor)
+        if end < start:
+            return None
+        return (start, end)
+
+    def promoter(self):
+        '''
+        Returns the name of the first promoter whose two anchors are the
+        expected distance apart, or None.
+        '''
+        for name, (start_anchor, gap, end_anchor) in PROMOTERS.items():
+            start = self.first(start_anchor)
+            while start != -1:
+                if self.DNA.startswith(end_anchor, start + len(start_anchor) + gap):
+                    return name
+                start = self.DNA.find(start_anchor, start + 1)
+        return None
+
+    def coding_region(self, promoter):
+        '''
+        Returns (start, end) of the coding region for promoter, or None.
+        '''
+        return self.spans(*CASSETTES[promoter])
+
+    def secretion(self):
+        '''
+        Returns the name of the first secretion signal found, or None.
+        '''
+        for name, anchors in SIGNALS.items():
+            if self.spans(*anchors):
+                return name
+        return None
+
+
+def reverse_complement(DNA):
+    '''
+    Returns the reverse complement of DNA.
+    '''
+    return DNA.translate(COMPLEMENT)[::-1]
+
+
+def circular_slice(DNA, start, length):
+    '''
+    Returns length bases of circular DNA from start, wrapping past the
+    end of the sequence if needed.
+    '''
+    start %= len(DNA)
+    end = start + length
+    if end <= len(DNA):
+        return DNA[start:end]
+    return DNA[start:] + DNA[:end - len(DNA)]
+
+
+def circular_positions(DNA, anchor):
+    '''
+    Yields each position of anchor in circular DNA, including an
+    occurrence that spans the end and start of the sequence. Only the
+    few bases around the origin are copied to find that one.
+    '''
+    position = DNA.find(anchor)
+    while position != -1:
+        yield position
+        position = DNA.find(anchor, position + 1)
+    overlap = len(anchor) - 1
+    if 0 < overlap < len(DNA):
+        junction = DNA[-overlap:] + DNA[:overlap]
+        position = junction.find(anchor)
+        while position != -1:
+            yield len(DNA) - overlap + position
+            position = junction.find(anchor, position + 1)
+
+
+def locate_promoter(DNA):
+    '''
+    Searches both strands of circular DNA for a promoter, as
+    MotifIndex.promoter does for the forward strand of a linear
+    sequence. Returns (strand, offset) such that orient(DNA, strand,
+    offset) starts with the promoter, or None. The reverse strand is
+    searched through the reverse complements of the anchors, so the
+    sequence itself is not copied.
+    '''
+    for start_anchor, gap, end_anchor in PROMOTERS.values():
+        distance = len(start_anchor) + gap
+        for position in circular_positions(DNA, start_anchor):
+            if circular_slice(DNA, position + distance, len(end_anchor)) == end_anchor:
+                return '+', position
+        reverse_start = reverse_complement(start_anchor)
+        reverse_end = reverse_complement(end_anchor)
+        for position in circular_positions(DNA, reverse_start):
+            # On the reverse strand the promoter runs right to left
+            end = position + len(start_anchor) - distance - len(end_anchor)
+            if circular_slice(DNA, end, len(end_anchor)) == reverse_end:
+                return '-', (len(DNA) - position - len(start_anchor)) % len(DNA)
+    return None
+
+
+def orient(DNA, strand, offset):
+    '''
+    Returns DNA, or its reverse complement if strand is '-', rotated to
+    start at offset.
+    '''
+    if strand == '-':
+        DNA = reverse_complement(DNA)
+    return DNA[offset:] + DNA[:offset]
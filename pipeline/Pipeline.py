@@ -0,0 +1,154 @@
+import os
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from memo.Memo import MEMO
+from profiling.Profiling import stage
+from summary.Summary import Summary, SummaryWriter
+from manager.Manager import (choose_fasta, single_fasta_parser, analyze_record,
+                             bounded_map)
+
+# Plasmids characterized, summarized and written together. Memory use
+# is set by this and the number of tasks in flight, not by the library.
+BATCH_SIZE = 1000
+# Tasks in flight per worker process
+WINDOW_PER_WORKER = 4
+# Files sent to a worker process per task
+CHUNK_SIZE = 64
+
+# Each stage is a generator that takes the items of the one before it,
+# so a library is processed one file at a time:
+#
+#   discover -> read -> analyze -> characterize -> summarize -> SummaryWriter
+#
+# analyze classifies each plasmid (promoter, cassette, secretion signal)
+# and translates its insert. Any per-item stage can be run in a process
+# pool with parallel(), which keeps a bounded number of tasks in flight,
+# so a slow consumer holds back the stages before it.
+
+
+def discover(root):
+    '''
+    Yields (path, fasta file) for each plasmid folder in root, in name
+    order. Folders with several fasta files use choose_fasta; folders
+    without one are skipped.
+    '''
+    folders = sorted(entry.name for entry in os.scandir(root) if entry.is_dir())
+    for folder in folders:
+        path = os.path.join(root, folder)
+        fasta_file, _ = choose_fasta(path)
+        if fasta_file:
+            yield path, fasta_file
+
+
+def read(files):
+    '''
+    Yields (path, fasta file, header, sequence) for the first record of
+    each (path, fasta file).
+    '''
+    for path, fasta_file in files:
+        chosen_file = os.path.join(path, fasta_file)
+        with stage('fasta.parse', chosen_file):
+            header, sequence = single_fasta_parser(chosen_file)
+        yield path, fasta_file, header, sequence
+
+
+def analyze(records):
+    '''
+    Yields the compact Plasmid object, or None if it is not a pichia
+    expression plasmid, for each (path, fasta file, header, sequence).
+    Mass, pI and tag are left for characterize.
+    '''
+    for path, fasta_file, header, sequence in records:
+        yield analyze_record(path, fasta_file, header, sequence, False, True)
+
+
+def analyze_chunk(files):
+    '''
+    Returns analyze(read(files)) as a list. Sent to worker processes
+    with several files at a time, so the cost of a task is spread over
+    many plasmids.
+    '''
+    return list(analyze(read(files)))
+
+
+def parallel(function, argument_tuples, executor=None, window=WINDOW_PER_WORKER):
+    '''
+    Yields function(*arguments) for each of argument_tuples, in order.
+    With an executor, calls run in its worker processes with at most
+    window in flight; otherwise they run here, one at a time.
+    '''
+    if executor is None:
+        for arguments in argument_tuples:
+            yield function(*arguments)
+        return
+    yield from bounded_map(executor, function, argument_tuples, window)
+
+
+def batches(items, size=BATCH_SIZE):
+    '''
+    Yields lists of up to size consecutive items.
+    '''
+    items = iter(items)
+    while batch := list(islice(items, size)):
+        yield batch
+
+
+def characterize(plasmids, batch_size=BATCH_SIZE):
+    '''
+    Drops the Nones from plasmids and yields lists of up to batch_size
+    Plasmid objects, with mass, pI and tag filled in one vectorized
+    pass per list.
+    '''
+    from composition.Composition import characterize_proteins
+    for batch in batches((oPlasmid for oPlasmid in plasmids if oPlasmid is not None),
+                         batch_size):
+        with stage('pipeline.characterize'):
+            characterize_proteins([oPlasmid.protein for oPlasmid in batch])
+        yield batch
+
+
+def summarize(plasmid_batches):
+    '''
+    Yields a Summary for each list of Plasmid objects.
+    '''
+    for batch in plasmid_batches:
+        with stage('pipeline.summarize'):
+            yield Summary(batch)
+
+
+def stream_summary(root, out_file, workers=1, batch_size=BATCH_SIZE, progress=None):
+    '''
+    Analyzes every plasmid folder in root and writes the summary rows
+    to out_file (.csv, .parquet or .arrow) as they are produced.
+    Neither the Plasmid objects nor the summary are kept for the whole
+    library. Reading and analysis run in workers processes, CHUNK_SIZE
+    files per task, when workers is greater than 1. progress, if given, is called as
+    progress(event, **fields) after each batch. Returns the number of
+    rows written.
+    '''
+    files = discover(root)
+    with SummaryWriter(out_file) as writer:
+        if workers > 1:
+            # Workers read their own files, so sequences are not sent
+            # between processes
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                chunks = parallel(analyze_chunk, ((chunk,) for chunk in batches(files, CHUNK_SIZE)),
+                                  executor, workers * WINDOW_PER_WORKER)
+                plasmids = (oPlasmid for chunk in chunks for oPlasmid in chunk)
+                write_batches(writer, summarize(characterize(plasmids, batch_size)), progress)
+        else:
+            plasmids = analyze(read(files))
+            write_batches(writer, summarize(characterize(plasmids, batch_size)), progress)
+    MEMO.drain_counts()
+    return writer.rows
+
+
+def write_batches(writer, summaries, progress=None):
+    '''
+    Writes each Summary in summaries with writer.
+    '''
+    for summary in summaries:
+        with stage('pipeline.write'):
+            writer.write(summary)
+        if progress:
+            progress('written', rows=writer.rows)
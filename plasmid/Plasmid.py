@@ -1,6 +1,9 @@
-import re
 from bcolors.bcolors import bcolors
 from protein.Protein import Protein
+from motif.Motif import MotifIndex, locate_promoter, orient
+from backbone.Backbone import check_backbone
+from memo.Memo import MEMO
+from profiling.Profiling import stage
 
 class NotPichia(Exception):
     '''raise this exception if plasmid creation fails.'''
@@ -11,27 +14,98 @@ class Plasmid():
     '''
     Class that represents a single pPICZ or pGAPZ plasmid.
     '''
-    def __init__(self, path, fasta_file, header, sequence):
+    # Fixed attributes keep each object small in large libraries
+    __slots__ = ('fasta_file', 'header', 'DNA', 'motifs', 'strand', 'offset',
+                 'promoter', 'coding_sequence', 'backbone', 'secretion',
+                 'mature_recombinant', 'protein')
+
+    def __init__(self, path, fasta_file, header, sequence, characterize=True,
+                 compact=False):
         self.fasta_file = fasta_file
         self.header = header
         self.DNA = sequence
-        self.promoter = self.get_promoter()
-        self.coding_sequence = self.get_coding_DNA()
-        self.secretion = self.secretion_check()
-        self.mature_recombinant = self.get_mature_protein()
-        self.protein = Protein(path, self.fasta_file, self.header, self.mature_recombinant)
+        self.motifs = MotifIndex(self.DNA)
+        # Strand and rotation of DNA relative to the sequence in the file
+        self.strand = '+'
+        self.offset = 0
+        try:
+            self.find_cassette()
+        except NotPichia:
+            # The plasmid may be in reverse orientation, or the origin
+            # may be inside the expression cassette
+            with stage('plasmid.reorient'):
+                reoriented = self.reorient()
+            if not reoriented:
+                raise
+            self.find_cassette()
+        with stage('plasmid.backbone_check'):
+            self.backbone = self.backbone_check()
+        with stage('plasmid.secretion_check'):
+            self.secretion = self.secretion_check()
+        with stage('plasmid.get_mature_protein'):
+            self.mature_recombinant = self.get_mature_protein()
+        self.protein = Protein(path, self.fasta_file, self.header,
+                               self.mature_recombinant, characterize)
+        if compact:
+            # The full plasmid sequence is only needed for the analysis
+            # above; whole-library runs drop it to save memory
+            self.DNA = None
+            self.motifs = None
+
+    @classmethod
+    def from_record(cls, fasta_file, record, protein):
+        '''
+        Creates a Plasmid from previously computed fields without running
+        the analysis. The full plasmid DNA is not kept.
+        '''
+        oPlasmid = cls.__new__(cls)
+        oPlasmid.fasta_file = fasta_file
+        oPlasmid.header = record['header']
+        oPlasmid.DNA = None
+        oPlasmid.motifs = None
+        oPlasmid.strand = record['strand']
+        oPlasmid.offset = record['offset']
+        oPlasmid.promoter = record['promoter']
+        oPlasmid.coding_sequence = record['coding_sequence']
+        oPlasmid.backbone = tuple(record['backbone'])
+        oPlasmid.secretion = record['secretion']
+        oPlasmid.mature_recombinant = record['mature_recombinant']
+        oPlasmid.protein = protein
+        return oPlasmid
         
+    def find_cassette(self):
+        '''
+        Sets self.promoter and self.coding_sequence, or raises NotPichia.
+        '''
+        with stage('plasmid.get_promoter'):
+            self.promoter = self.get_promoter()
+        with stage('plasmid.get_coding_DNA'):
+            self.coding_sequence = self.get_coding_DNA()
+
+    def reorient(self):
+        '''
+        Looks for a promoter on both strands of the circular plasmid. If
+        one is found, self.DNA is replaced by the strand that carries it,
+        rotated to start at the promoter, and self.strand and
+        self.offset record how. Returns False if there is no promoter,
+        or if it is already at the start of the forward strand.
+        '''
+        located = locate_promoter(self.DNA)
+        if located is None or located == ('+', 0):
+            return False
+        self.strand, self.offset = located
+        self.DNA = orient(self.DNA, self.strand, self.offset)
+        self.motifs = MotifIndex(self.DNA)
+        return True
+
     def get_promoter(self):
         '''
         Searches for methanol inducible aox1 promoter (pPICZ plasmids). If
         not found, looks for constitutive gap promoter (pGAPZ plasmids).
         '''
-        aox1 = re.compile(r'AGATCTAACATC.{916}TTATTCGAAACG')
-        gap = re.compile(r'AGATCTTTTTTG.{459}TTGAACAACTAT')
-        if aox1.search(self.DNA):
-            return 'aox1'
-        if gap.search(self.DNA):
-            return 'gap'
+        promoter = self.motifs.promoter()
+        if promoter:
+            return promoter
         raise NotPichia('Could not find aox1 or gap promoter')
 
     def get_coding_DNA(self):
@@ -41,29 +115,27 @@ class Plasmid():
         Assumes that protein is a fusion that ends after the plasmid-encoded 
         his tag, even if there is a stop codon.
         '''
-        aox1_coding = re.compile(r'TTATTCGAAACG(.*)GTTTGTAGCCTT')
-        gap_coding = re.compile(r'TATTTCGAAACG(.*)GTTTTAGCCTTA')
-        if self.promoter == 'aox1':
-            if match := aox1_coding.search(self.DNA):
-                return match.group(1)
-        if self.promoter == 'gap':
-            if match := gap_coding.search(self.DNA):
-                return match.group(1)
+        if region := self.motifs.coding_region(self.promoter):
+            start, end = region
+            return self.DNA[start:end]
         raise NotPichia('Could not find coding sequence.')
 
+    def backbone_check(self):
+        '''
+        Compares the plasmid outside the coding region with the reference
+        backbone for its promoter. Returns (status, substituted bases,
+        inserted and deleted bases, changes); see
+        backbone.Backbone.check_backbone.
+        '''
+        return check_backbone(self.DNA, self.promoter,
+                              self.motifs.coding_region(self.promoter))
 
     def secretion_check(self):
         '''
-        Uses re to check for alpha factor secretion signal sequence
-        and Ost1 variant. Returns 'alpha', 'ost1', or None.
+        Checks for alpha factor secretion signal sequence and Ost1
+        variant. Returns 'alpha', 'ost1', or 'cytoplasmic'.
         '''
-        alpha = re.compile(r'ATGAGATTTCCT.*GAGGCTGAAGCT')
-        ost1 = re.compile(r'ATGAGGCAGGTT.*GAGGCTGAAGCT')
-        if alpha.search(self.DNA):
-            return 'alpha'
-        if ost1.search(self.DNA):
-            return 'ost1'
-        return 'cytoplasmic'
+        return self.motifs.secretion() or 'cytoplasmic'
 
     
     def get_mature_protein(self):
@@ -73,47 +145,19 @@ class Plasmid():
         sequence (alpha, ost1, ''), return mature,recombinant 
         protein sequence.
         '''
-        aa_to_stop = ''
-        mature = ''
-        genetic_code = {'TTT': 'F', 'TTC': 'F', 'TTA': 'L', 'TTG': 'L',
-                        'TCT': 'S', 'TCC': 'S', 'TCA': 'S', 'TCG': 'S',
-                        'TAT': 'Y', 'TAC': 'Y', 'TAA': '*', 'TAG': '*',
-                        'TGT': 'C', 'TGC': 'C', 'TGA': '*', 'TGG': 'W',
-                        'CTT': 'L', 'CTC': 'L', 'CTA': 'L', 'CTG': 'L',
-                        'CCT': 'P', 'CCC': 'P', 'CCA': 'P', 'CCG': 'P',
-                        'CAT': 'H', 'CAC': 'H', 'CAA': 'Q', 'CAG': 'Q',
-                        'CGT': 'R', 'CGC': 'R', 'CGA': 'R', 'CGG': 'R',
-                        'ATT': 'I', 'ATC': 'I', 'ATA': 'I', 'ATG': 'M',
-                        'ACT': 'T', 'ACC': 'T', 'ACA': 'T', 'ACG': 'T',
-                        'AAT': 'N', 'AAC': 'N', 'AAA': 'K', 'AAG': 'K',
-                        'AGT': 'S', 'AGC': 'S', 'AGA': 'R', 'AGG': 'R',
-                        'GTT': 'V', 'GTC': 'V', 'GTA': 'V', 'GTG': 'V',
-                        'GCT': 'A', 'GCC': 'A', 'GCA': 'A', 'GCG': 'A',
-                        'GAT': 'D', 'GAC': 'D', 'GAA': 'E', 'GAG': 'E',
-                        'GGT': 'G', 'GGC': 'G', 'GGA': 'G', 'GGG': 'G'
-                        }
-
         if not self.coding_sequence:
             return None
         
         # Ensure in-frame start at ATG. some GAP cytoplasmic
         # sequences have extra nucleotides
-        start_at_atg = re.compile(r'ATG.*')
-        new_coding = start_at_atg.search(self.coding_sequence)
-        try:
-            self.coding_sequence = new_coding.group()
-        except AttributeError:
+        start = self.coding_sequence.find('ATG')
+        if start == -1:
             return ""
-        for first, second, third in zip(
-                self.coding_sequence[::3],
-                self.coding_sequence[1::3],
-                self.coding_sequence[2::3]
-        ):
-            codon = first + second + third
-            codon = codon.upper()
-            aa_to_stop = aa_to_stop + genetic_code[codon]
-            if aa_to_stop.endswith('*'):
-                break
+        self.coding_sequence = self.coding_sequence[start:]
+        # Loaded here so that numpy is not imported at startup
+        from translation.Translation import translate_to_stop
+        # Identical inserts are translated once
+        aa_to_stop = MEMO.get('translation', self.coding_sequence, translate_to_stop)
         mature = aa_to_stop[:-1]
         if self.secretion == 'alpha':
             return mature[89:]
@@ -141,7 +185,10 @@ class Plasmid():
     def __repr__(self):
         return_str = ''
         return_str += f'name: {self.header}\n'
+        return_str += f'orientation: {self.strand} strand, rotated by {self.offset} bp\n'
         return_str += f'promoter: {self.promoter}\n'
+        status, _, _, changes = self.backbone
+        return_str += f'backbone: {status}' + (f' ({changes})' if changes else '') + '\n'
         return_str += f'secretion: {self.secretion}\n'
         return_str += f'coding sequence: {self.coding_sequence[:20]}'
         return_str += f'...{self.coding_sequence[-20:]}'
@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import heapq
+import threading
+
+# Set KOMAGATAELLA_PROFILE=1 (or run main.py --profile) to record stages
+ENV_VAR = 'KOMAGATAELLA_PROFILE'
+# Chrome trace events kept per run; stage totals are always complete
+MAX_EVENTS = 200000
+
+
+class NullStage():
+    '''
+    Context manager used when profiling is off. It does nothing, so a
+    disabled stage costs one method call.
+    '''
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_STAGE = NullStage()
+
+
+class Stage():
+    '''
+    Context manager that times one stage and reports it to a Profiler.
+    '''
+    __slots__ = ('profiler', 'name', 'file', 'start', 'cpu_start')
+
+    def __init__(self, profiler, name, file):
+        self.profiler = profiler
+        self.name = name
+        self.file = file
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.cpu_start = time.process_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        wall = time.perf_counter() - self.start
+        cpu = time.process_time() - self.cpu_start
+        self.profiler.record(self.name, self.file, self.start, wall, cpu)
+        return False
+
+
+class Profiler():
+    '''
+    Collects per-stage counts and wall/CPU time, per-file wall time, and
+    trace events that can be written as JSON or in Chrome trace format.
+    '''
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        '''
+        Forgets everything recorded so far.
+        '''
+        # stage: [count, wall seconds, cpu seconds]
+        self.stats = {}
+        # file: wall seconds
+        self.files = {}
+        self.events = []
+
+    def stage(self, name, file=None):
+        '''
+        Returns a context manager that times the stage name. When file
+        is given, the time is also added to that file's total.
+        '''
+        if not self.enabled:
+            return NULL_STAGE
+        return Stage(self, name, file)
+
+    def record(self, name, file, start, wall, cpu):
+        '''
+        Adds one timed stage.
+        '''
+        stats = self.stats.setdefault(name, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += wall
+        stats[2] += cpu
+        if file is not None:
+            self.files[file] = self.files.get(file, 0.0) + wall
+        if len(self.events) < MAX_EVENTS:
+            self.events.append({
+                'name': name, 'cat': 'komagataella', 'ph': 'X',
+                'ts': start * 1e6, 'dur': wall * 1e6,
+                'pid': os.getpid(), 'tid': threading.get_ident(),
+                'args': {'file': file} if file is not None else {},
+            })
+
+    def drain(self):
+        '''
+        Returns everything recorded as a plain dict and resets.
+        '''
+        snapshot = {'stats': self.stats, 'files': self.files, 'events': self.events}
+        self.reset()
+        return snapshot
+
+    def merge(self, snapshot):
+        '''
+        Adds a snapshot from drain(), e.g. one sent back by a worker
+        process.
+        '''
+        for name, (count, wall, cpu) in snapshot['stats'].items():
+            stats = self.stats.setdefault(name, [0, 0.0, 0.0])
+            stats[0] += count
+            stats[1] += wall
+            stats[2] += cpu
+        for file, wall in snapshot['files'].items():
+            self.files[file] = self.files.get(file, 0.0) + wall
+        room = MAX_EVENTS - len(self.events)
+        self.events.extend(snapshot['events'][:max(room, 0)])
+
+    def summary(self, top=10):
+        '''
+        Returns a dict with stage totals, slowest first, and the top
+        slowest files.
+        '''
+        stages = [{'stage': name, 'count': count, 'wall': wall, 'cpu': cpu,
+                   'mean_wall': wall / count}
+                  for name, (count, wall, cpu) in self.stats.items()]
+        stages.sort(key=lambda stage: -stage['wall'])
+        slowest = heapq.nlargest(top, self.files.items(), key=lambda item: item[1])
+        return {'stages': stages,
+                'slowest_files': [{'file': file, 'wall': wall} for file, wall in slowest]}
+
+    def report(self, top=10):
+        '''
+        Prints the stage totals and the slowest files.
+        '''
+        summary = self.summary(top)
+        print(f"\n{'stage':<32} {'count':>8} {'wall s':>10} {'cpu s':>10} {'mean ms':>10}")
+        for stage in summary['stages']:
+            print(f"{stage['stage']:<32} {stage['count']:>8} {stage['wall']:>10.3f} "
+                  f"{stage['cpu']:>10.3f} {stage['mean_wall'] * 1000:>10.3f}")
+        if summary['slowest_files']:
+            print(f'\nSlowest {len(summary["slowest_files"])} files:')
+            for item in summary['slowest_files']:
+                print(f"{item['wall'] * 1000:>10.3f} ms  {item['file']}")
+
+    def write_json(self, out_file, top=10):
+        '''
+        Writes the summary from summary() as JSON.
+        '''
+        with open(out_file, 'wt', encoding='utf-8') as jsonfile:
+            json.dump(self.summary(top), jsonfile, indent=2)
+
+    def write_chrome_trace(self, out_file):
+        '''
+        Writes the recorded events in Chrome trace format, for
+        chrome://tracing or https://ui.perfetto.dev.
+        '''
+        with open(out_file, 'wt', encoding='utf-8') as tracefile:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, tracefile)
+
+
+PROFILER = Profiler(enabled=os.environ.get(ENV_VAR, '') not in ('', '0'))
+
+
+def stage(name, file=None):
+    '''
+    Returns a context manager timing stage name with the global profiler.
+    '''
+    return PROFILER.stage(name, file)
+
+
+def enabled():
+    '''
+    Returns True if the global profiler is recording.
+    '''
+    return PROFILER.enabled
+
+
+def enable():
+    '''
+    Turns on the global profiler, here and in worker processes started
+    later.
+    '''
+    PROFILER.enabled = True
+    os.environ[ENV_VAR] = '1'
+
+
+def run_profiled(function, *args):
+    '''
+    Calls function(*args) in a worker process and returns (result,
+    snapshot) so the parent can merge the worker's timings.
+    '''
+    PROFILER.enabled = True
+    PROFILER.reset()
+    result = function(*args)
+    return result, PROFILER.drain()
@@ -1,70 +1,119 @@
-import re
 import os
-from Bio.SeqUtils.IsoelectricPoint import IsoelectricPoint as IP
-from Bio.Blast import NCBIWWW
-from Bio.Blast import NCBIXML
+import sys
+from blast.Blast import load_hits
+from profiling.Profiling import stage
+from memo.Memo import MEMO
+
+# Monoisotopic residue masses
+WATER = 18.000
+MASS_DICT = {
+    'A': 71.03711,
+    'R': 156.10111,
+    'N': 114.04293,
+    'D': 115.02694,
+    'C': 103.00919,
+    'Q': 128.05858,
+    'E': 129.04259,
+    'G': 57.02146,
+    'H': 137.05891,
+    'I': 113.08406,
+    'L': 113.08406,
+    'K': 128.09496,
+    'M': 131.04049,
+    'F': 147.06841,
+    'P': 97.05276,
+    'S': 87.03203,
+    'T': 101.04768,
+    'W': 186.07931,
+    'Y': 163.06333,
+    'V': 99.06841,
+    }
+# Residues translated from ambiguous codons (X) are given the mean
+# residue mass
+UNKNOWN_MASS = sum(MASS_DICT.values()) / len(MASS_DICT)
+HIS_TAG = 'HHHHHH'
 
 class Protein():
     """Protein object from header and sequence."""
 
-    def __init__(self, path, fasta_file, header, amino_acids):
+    # Fixed attributes keep each object small in large libraries
+    __slots__ = ('path', 'fasta_file', 'header', 'amino_acids', 'length',
+                 'mw', 'tag', 'pI', 'blast', 'identifier', 'description',
+                 'organism', 'evalue')
+
+    def __init__(self, path, fasta_file, header, amino_acids, characterize=True):
         self.path = path
         self.fasta_file = fasta_file
         self.header = header
         self.amino_acids = amino_acids
         self.length = len(amino_acids)
-        self.mw = self.mass(amino_acids)
-        self.tag = self.check_tag_anywhere()
-        self.pI = self.get_pI()
+        # With characterize=False, mw, tag and pI are left as None to be
+        # filled in for many proteins at once by
+        # composition.Composition.characterize_proteins
+        self.mw = None
+        self.tag = None
+        self.pI = None
+        if characterize:
+            # Identical proteins are characterized once
+            self.mw, self.tag, self.pI = MEMO.get('protein', amino_acids,
+                                                  self.characterize)
         self.blast = False
         self.identifier = ""
         self.description = ""
         self.organism = ""
         self.evalue = ""
+
+    @classmethod
+    def from_record(cls, path, fasta_file, record):
+        '''
+        Creates a Protein from previously computed fields without
+        recalculating mass, tag and pI.
+        '''
+        protein = cls.__new__(cls)
+        protein.path = path
+        protein.fasta_file = fasta_file
+        protein.header = record['header']
+        protein.amino_acids = record['mature_recombinant']
+        protein.length = len(protein.amino_acids)
+        protein.mw = record['mw']
+        protein.tag = record['tag']
+        protein.pI = record['pI']
+        protein.blast = False
+        protein.identifier = record['identifier']
+        protein.description = sys.intern(record['description'])
+        protein.organism = sys.intern(record['organism'])
+        protein.evalue = ""
+        return protein
         
+    def characterize(self, amino_acids):
+        '''
+        Returns (mass, tag, pI) for amino_acids, the sequence of this
+        protein.
+        '''
+        with stage('protein.mass'):
+            mw = self.mass(amino_acids)
+        with stage('protein.check_tag_anywhere'):
+            tag = self.check_tag_anywhere()
+        with stage('protein.get_pI'):
+            pI = self.get_pI()
+        return mw, tag, pI
+
     def mass(self, amino_acids):
         """
         Returns the monoisotopic mass for a protein or peptide.
         """
-        CONSTANT = 18.000
-        mass_dict = {
-            'A': 71.03711,
-            'R': 156.10111,
-            'N': 114.04293,
-            'D': 115.02694,
-            'C': 103.00919,
-            'Q': 128.05858,
-            'E': 129.04259,
-            'G': 57.02146,
-            'H': 137.05891,
-            'I': 113.08406,
-            'L': 113.08406,
-            'K': 128.09496,
-            'M': 131.04049,
-            'F': 147.06841,
-            'P': 97.05276,
-            'S': 87.03203,
-            'T': 101.04768,
-            'W': 186.07931,
-            'Y': 163.06333,
-            'V': 99.06841,
-            }
-        protein_mass = CONSTANT
+        protein_mass = WATER
         for residue in amino_acids:
-            protein_mass = protein_mass + mass_dict[residue]
+            protein_mass = protein_mass + MASS_DICT.get(residue, UNKNOWN_MASS)
         return protein_mass / 1000
         
     def check_tag_anywhere(self):
         '''
         Checks protein sequence for a His tag.
         '''
-        tag_re = re.compile(r'HHHHHH')
         if not self.amino_acids:
             return False
-        if tag_re.search(self.amino_acids):
-            return True
-        else:
-            return False
+        return HIS_TAG in self.amino_acids
 
 
     def get_pI(self):
@@ -72,6 +121,8 @@ class Protein():
         Uses biopython method to calculate and return the pI of
         self.mature_recombinant.
         '''
+        # Biopython is only loaded when needed, to keep startup fast
+        from Bio.SeqUtils.IsoelectricPoint import IsoelectricPoint as IP
         protein = IP(self.amino_acids)
         return protein.pi()
 
@@ -98,46 +149,26 @@ class Protein():
         Extracts and returns identifier, description, and organism for the top
         blastp hit.
         '''
-        alignment_parser = re.compile(r'\|([A-Z_.0-9]*)\|[ ]{0,1}(.*?)\[(.*?)\]')
         blast_file_out = f'{self.path}/{self.fasta_file}_blast.xml'
-        result_handle = open(blast_file_out)
-        blast_record = NCBIXML.read(result_handle)
-        if blast_record.alignments:
-            top_alignment = blast_record.alignments[0]
-            title_match =  alignment_parser.search(top_alignment.title)
-            identifier, description, organism = title_match.groups()
-            self.identifier = identifier.strip()
-            self.description = description.strip()
-            self.organism = organism.strip()
+        with stage('protein.parse_blast', blast_file_out):
+            hits = load_hits(blast_file_out)
+        if hits:
+            top_hit = hits[0]
+            self.identifier = top_hit['identifier']
+            # Many constructs share organisms and descriptions
+            self.description = sys.intern(top_hit['description'])
+            self.organism = sys.intern(top_hit['organism'])
+            self.evalue = top_hit['evalue']
         else:
-            print('No alignments found in {blast_file_out}.')
+            print(f'No alignments found in {blast_file_out}.')
 
     def print_blast(self):
         '''
         Print summary for top blastp hits.
         '''
-        description_parser = re.compile(r'^(\w{2,4})\|([\S]*)\|([^>0-9]*).+\s([0-9.]*)$')
         blast_file_out = f'{self.path}/{self.fasta_file}_blast.xml'
-        result_handle = open(blast_file_out)
-        blast_record = NCBIXML.read(result_handle) # <class 'Bio.Blast.NCBIXML.Blast'>
-        for idx, description in enumerate(blast_record.descriptions):
-            desc_str = str(description)
-            evalue_match = description_parser.search(desc_str)
-            try:
-                groups = evalue_match.groups()
-                print(f'{groups[0]:>3} {groups[1].strip():>15}   {groups[2][:40].strip():<40} {groups[3].strip():>15}')
-            except AttributeError:
-                print(description)
-            if idx == 4:
-                break
-        # if blast_record.alignments:
-        #     for idx, alignment in enumerate(blast_record.alignments):
-        #         print(f'{idx:>3} {alignment}')
-        #         title_match = alignment_parser.search(alignment.title)
-        #         identifier, description, organism = title_match.groups()
-        #         print(f'{idx + 1:>3}. {identifier:>15}\t{description[:40]:<40}\t{organism:<35}\t')
-        #         if idx == 5:
-        #             break
+        for hit in load_hits(blast_file_out):
+            print(f"{hit['database']:>3} {hit['identifier']:>15}   {hit['definition'][:40]:<40} {hit['evalue']:>15}")
 
     def run_blast(self):
         '''
@@ -147,6 +178,7 @@ class Protein():
         print()
         print('Running remote blastp against nr database...')
         print()
+        from Bio.Blast import NCBIWWW
         result_handle = NCBIWWW.qblast('blastp', 'nr', self.amino_acids)
         blast_file_out = f'{self.path}/{self.fasta_file}_blast.xml'
 
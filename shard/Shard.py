@@ -0,0 +1,144 @@
+import os
+import json
+import hashlib
+from cache.Cache import analysis_version
+from summary.Summary import Summary, COLUMNS
+from manager.Manager import Manager, get_folders, choose_fasta
+
+MANIFEST_FORMAT = 1
+
+
+class IncompleteMerge(ValueError):
+    '''raise this exception if the partials do not cover the manifest.'''
+    pass
+
+
+def shard_of(folder, shards):
+    '''
+    Returns the shard, from 0 to shards - 1, of a folder name. The hash
+    does not depend on the Python process or host, so every planner
+    assigns a folder to the same shard.
+    '''
+    digest = hashlib.blake2b(folder.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % shards
+
+
+def manifest_id(manifest):
+    '''
+    Returns a digest of the shard assignment, recorded in each partial
+    so partials of different plans are not merged together.
+    '''
+    assignment = json.dumps([manifest['shards'], manifest['folders']], sort_keys=True)
+    return hashlib.blake2b(assignment.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def plan(root, shards, manifest_file):
+    '''
+    Assigns the plasmid folders in root to shards by a stable hash of
+    their names and writes the manifest to manifest_file. The fasta file
+    of each folder is chosen here, with choose_fasta, so every worker
+    analyzes the same file. Returns the manifest.
+    '''
+    if shards < 1:
+        raise ValueError('The number of shards must be at least 1')
+    folders = {}
+    for folder in get_folders(os.path.join(root, ''), clear=False):
+        fasta_file, _ = choose_fasta(os.path.join(root, folder))
+        folders[folder] = {'shard': shard_of(folder, shards), 'file': fasta_file}
+    manifest = {'format': MANIFEST_FORMAT, 'root': root, 'shards': shards,
+                'folders': folders}
+    manifest['id'] = manifest_id(manifest)
+    with open(manifest_file, 'wt', encoding='utf-8') as out:
+        json.dump(manifest, out, indent=1)
+    return manifest
+
+
+def load_manifest(manifest_file):
+    '''
+    Reads a manifest written by plan.
+    '''
+    with open(manifest_file, encoding='utf-8') as manifest_in:
+        manifest = json.load(manifest_in)
+    if manifest.get('format') != MANIFEST_FORMAT or manifest.get('id') != manifest_id(manifest):
+        raise ValueError(f'{manifest_file} is not a valid shard manifest')
+    return manifest
+
+
+def shard_folders(manifest, shard):
+    '''
+    Returns the names of the folders of shard, in name order.
+    '''
+    if not 0 <= shard < manifest['shards']:
+        raise ValueError(f"Shard {shard} is not in 0-{manifest['shards'] - 1}")
+    return sorted(folder for folder, entry in manifest['folders'].items()
+                  if entry['shard'] == shard)
+
+
+def run_shard(manifest_file, shard, out_file, root=None, workers=1, progress=None):
+    '''
+    Analyzes the folders of one shard and writes its partial summary to
+    out_file as JSON: a summary row for each folder, or None if it is
+    not a pichia expression plasmid. root replaces the manifest's root
+    on a host where the library is mounted elsewhere. Returns the
+    number of folders analyzed.
+    '''
+    manifest = load_manifest(manifest_file)
+    root = root or manifest['root']
+    folders = [folder for folder in shard_folders(manifest, shard)
+               if manifest['folders'][folder]['file']]
+    paths = [os.path.join(root, folder) for folder in folders]
+    chosen_files = [os.path.join(path, manifest['folders'][folder]['file'])
+                    for path, folder in zip(paths, folders)]
+    results = Manager().analyze_files(paths, chosen_files, workers, progress=progress)
+    rows = iter(Summary([oPlasmid for oPlasmid in results if oPlasmid is not None]).rows())
+    partial = {
+        'manifest': manifest['id'],
+        'shard': shard,
+        'version': analysis_version(),
+        'columns': COLUMNS,
+        'rows': {folder: None if oPlasmid is None else list(next(rows))
+                 for folder, oPlasmid in zip(folders, results)},
+    }
+    with open(out_file, 'wt', encoding='utf-8') as out:
+        json.dump(partial, out)
+    return len(folders)
+
+
+def merge(manifest_file, partial_files):
+    '''
+    Combines the partial summaries of every shard into one Summary, in
+    folder order as Manager.create_all_objects gives it. Raises
+    IncompleteMerge if a shard is missing or repeated, or a partial does
+    not have exactly the folders the manifest assigns to its shard.
+    '''
+    manifest = load_manifest(manifest_file)
+    partials = {}
+    versions = set()
+    for partial_file in partial_files:
+        with open(partial_file, encoding='utf-8') as partial_in:
+            partial = json.load(partial_in)
+        if partial['manifest'] != manifest['id']:
+            raise IncompleteMerge(f'{partial_file} belongs to a different manifest')
+        if partial['columns'] != COLUMNS:
+            raise IncompleteMerge(f'{partial_file} has different summary columns')
+        if partial['shard'] in partials:
+            raise IncompleteMerge(f"Shard {partial['shard']} appears more than once")
+        partials[partial['shard']] = partial
+        versions.add(partial['version'])
+    missing = sorted(set(range(manifest['shards'])) - set(partials))
+    if missing:
+        raise IncompleteMerge('Missing shards: ' + ', '.join(map(str, missing)))
+    if len(versions) > 1:
+        raise IncompleteMerge('Shards were analyzed by different versions of the analysis code')
+    rows = {}
+    for shard, partial in sorted(partials.items()):
+        expected = {folder for folder in shard_folders(manifest, shard)
+                    if manifest['folders'][folder]['file']}
+        if set(partial['rows']) != expected:
+            absent = sorted(expected - set(partial['rows']))
+            extra = sorted(set(partial['rows']) - expected)
+            raise IncompleteMerge(f'Shard {shard} does not match the manifest; '
+                                  f'missing {absent}, unexpected {extra}')
+        rows.update(partial['rows'])
+    return Summary.from_rows(tuple(rows[folder]) for folder in sorted(rows)
+                             if rows[folder] is not None)
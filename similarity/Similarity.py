@@ -0,0 +1,102 @@
+from collections import Counter
+
+# Length of the peptide words used to compare proteins. Five residues
+# is long enough that unrelated proteins rarely share words.
+K = 5
+
+
+def kmers(sequence, k=K):
+    '''
+    Returns the set of words of length k in sequence.
+    '''
+    return {sequence[idx:idx + k] for idx in range(len(sequence) - k + 1)}
+
+
+class KmerIndex():
+    '''
+    Inverted index from peptide k-mers to the proteins that contain
+    them. Similarity is the Jaccard index of the two k-mer sets. Proteins
+    can be added and removed one at a time, so the index follows the
+    library without being rebuilt.
+    '''
+    def __init__(self, k=K):
+        self.k = k
+        self.postings = {}
+        self.sizes = {}
+        # Kept so a protein's k-mers can be found again on removal;
+        # these are the same string objects as Protein.amino_acids
+        self.sequences = {}
+
+    def __contains__(self, name):
+        return name in self.sizes
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def add(self, name, sequence):
+        '''
+        Adds (or replaces) the protein called name.
+        '''
+        if name in self.sizes:
+            self.remove(name)
+        words = kmers(sequence, self.k)
+        for word in words:
+            self.postings.setdefault(word, set()).add(name)
+        self.sizes[name] = len(words)
+        self.sequences[name] = sequence
+
+    def remove(self, name):
+        '''
+        Removes the protein called name from the index.
+        '''
+        if name not in self.sizes:
+            return
+        for word in kmers(self.sequences.pop(name), self.k):
+            names = self.postings[word]
+            names.discard(name)
+            if not names:
+                del self.postings[word]
+        del self.sizes[name]
+
+    def query(self, sequence, top=5, min_score=0.0, exclude=None):
+        '''
+        Returns up to top (name, score, shared k-mers) tuples for the
+        indexed proteins most similar to sequence, best first.
+        '''
+        words = kmers(sequence, self.k)
+        shared = Counter()
+        for word in words:
+            shared.update(self.postings.get(word, ()))
+        hits = []
+        for name, count in shared.items():
+            if name == exclude:
+                continue
+            score = count / (len(words) + self.sizes[name] - count)
+            if score >= min_score:
+                hits.append((name, score, count))
+        hits.sort(key=lambda hit: (-hit[1], hit[0]))
+        return hits[:top]
+
+    def clusters(self, min_score=0.5):
+        '''
+        Groups the indexed proteins by single linkage: two proteins are
+        in the same cluster if a chain of pairs with a score of at least
+        min_score connects them. Returns a list of clusters (lists of
+        names), largest first.
+        '''
+        parent = {name: name for name in self.sizes}
+
+        def find(name):
+            while parent[name] != name:
+                parent[name] = parent[parent[name]]
+                name = parent[name]
+            return name
+
+        for name in self.sizes:
+            for other, _, _ in self.query(self.sequences[name], top=len(self.sizes),
+                                          min_score=min_score, exclude=name):
+                parent[find(other)] = find(name)
+        groups = {}
+        for name in sorted(self.sizes):
+            groups.setdefault(find(name), []).append(name)
+        return sorted(groups.values(), key=lambda group: (-len(group), group[0]))
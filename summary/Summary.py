@@ -0,0 +1,275 @@
+import os
+import csv
+import numpy as np
+from motif.Motif import PROMOTERS, SIGNALS
+from codon.Codon import codon_usage
+
+# Column names, in export order
+COLUMNS = ['plasmid', 'promoter', 'SSS', 'tag', 'kDa', 'pI',
+           'coding bp', 'length aa', 'CAI', 'GC %', 'rare codons', 'rare clusters',
+           'backbone', 'backbone subs', 'backbone indels', 'backbone changes',
+           'strand', 'offset', 'top hit', 'organism']
+CATEGORICAL = ['promoter', 'SSS']
+EXPORT_FORMATS = ('.csv', '.parquet', '.arrow', '.feather')
+
+
+class Summary():
+    '''
+    The library summary held as typed columns: NumPy arrays for numbers
+    and flags, category codes plus a category list for promoter and
+    secretion signal, and lists of strings for the text columns. The
+    columns are filled straight from the Plasmid objects and can be
+    written to CSV, Parquet or Arrow IPC without going through pandas.
+    Codon usage columns are computed for all coding sequences at once.
+    '''
+    def __init__(self, plasmids):
+        n = len(plasmids)
+        self.length = n
+        cai, gc, rare, clusters = codon_usage([plasmid.coding_sequence for plasmid in plasmids])
+        self.columns = {
+            'plasmid': [plasmid.header for plasmid in plasmids],
+            'tag': np.fromiter((bool(plasmid.protein.tag) for plasmid in plasmids),
+                               dtype=np.bool_, count=n),
+            'kDa': np.fromiter((plasmid.protein.mw for plasmid in plasmids),
+                               dtype=np.float64, count=n),
+            'pI': np.fromiter((plasmid.protein.pI for plasmid in plasmids),
+                              dtype=np.float64, count=n),
+            'coding bp': np.fromiter((len(plasmid.coding_sequence) for plasmid in plasmids),
+                                     dtype=np.int64, count=n),
+            'length aa': np.fromiter((plasmid.protein.length for plasmid in plasmids),
+                                     dtype=np.int64, count=n),
+            'CAI': cai,
+            'GC %': gc,
+            'rare codons': rare.astype(np.int64),
+            'rare clusters': clusters,
+            'backbone': [plasmid.backbone[0] for plasmid in plasmids],
+            'backbone subs': np.fromiter((plasmid.backbone[1] for plasmid in plasmids),
+                                         dtype=np.int64, count=n),
+            'backbone indels': np.fromiter((plasmid.backbone[2] for plasmid in plasmids),
+                                           dtype=np.int64, count=n),
+            'backbone changes': [plasmid.backbone[3] for plasmid in plasmids],
+            'strand': [plasmid.strand for plasmid in plasmids],
+            'offset': np.fromiter((plasmid.offset for plasmid in plasmids),
+                                  dtype=np.int64, count=n),
+            'top hit': [plasmid.protein.description for plasmid in plasmids],
+            'organism': [plasmid.protein.organism for plasmid in plasmids],
+        }
+        # Known values first, so codes are stable between runs
+        self.categories = {
+            'promoter': list(PROMOTERS),
+            'SSS': list(SIGNALS) + ['cytoplasmic'],
+        }
+        self.codes = {
+            'promoter': self.encode('promoter', (plasmid.promoter for plasmid in plasmids)),
+            'SSS': self.encode('SSS', (plasmid.secretion for plasmid in plasmids)),
+        }
+
+    @classmethod
+    def from_rows(cls, rows):
+        '''
+        Creates a Summary from row tuples in COLUMNS order, such as those
+        from rows(), without the Plasmid objects.
+        '''
+        rows = list(rows)
+        summary = cls([])
+        summary.length = len(rows)
+        values = dict(zip(COLUMNS, zip(*rows))) if rows else {column: () for column in COLUMNS}
+        for column, current in summary.columns.items():
+            if isinstance(current, np.ndarray):
+                summary.columns[column] = np.array(values[column], dtype=current.dtype)
+            else:
+                summary.columns[column] = list(values[column])
+        for column in CATEGORICAL:
+            summary.codes[column] = summary.encode(column, values[column])
+        return summary
+
+    def __len__(self):
+        return self.length
+
+    def encode(self, column, values):
+        '''
+        Returns an int8 array of category codes for values, adding any
+        value not seen before to the categories of column.
+        '''
+        categories = self.categories[column]
+        lookup = {value: code for code, value in enumerate(categories)}
+        codes = np.empty(self.length, dtype=np.int8)
+        for idx, value in enumerate(values):
+            if value not in lookup:
+                lookup[value] = len(categories)
+                categories.append(value)
+            codes[idx] = lookup[value]
+        return codes
+
+    def values(self, column):
+        '''
+        Returns the plain values of a column; categories are decoded.
+        '''
+        if column in CATEGORICAL:
+            categories = np.array(self.categories[column], dtype=object)
+            return categories[self.codes[column]]
+        return self.columns[column]
+
+    def to_pandas(self):
+        '''
+        Returns a pandas DataFrame, with promoter and SSS as categoricals.
+        '''
+        import pandas as pd
+        data = {}
+        for column in COLUMNS:
+            if column in CATEGORICAL:
+                data[column] = pd.Categorical.from_codes(self.codes[column],
+                                                         self.categories[column])
+            else:
+                data[column] = self.columns[column]
+        return pd.DataFrame(data, columns=COLUMNS)
+
+    def to_arrow(self):
+        '''
+        Returns a pyarrow Table, with promoter and SSS as dictionary
+        columns.
+        '''
+        pa = import_pyarrow()
+        arrays = []
+        for column in COLUMNS:
+            if column in CATEGORICAL:
+                arrays.append(pa.DictionaryArray.from_arrays(
+                    pa.array(self.codes[column], type=pa.int8()),
+                    pa.array(self.categories[column], type=pa.string())))
+            else:
+                arrays.append(pa.array(self.columns[column]))
+        return pa.Table.from_arrays(arrays, names=COLUMNS)
+
+    def rows(self):
+        '''
+        Returns an iterator over the rows, as tuples of plain Python
+        values in COLUMNS order.
+        '''
+        columns = [self.values(column) for column in COLUMNS]
+        columns = [column.tolist() if isinstance(column, np.ndarray) else column
+                   for column in columns]
+        return zip(*columns)
+
+    def write_csv(self, out_file):
+        '''
+        Writes the summary as CSV with a header row.
+        '''
+        with open(out_file, 'wt', encoding='utf-8', newline='') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(COLUMNS)
+            writer.writerows(self.rows())
+
+    def write_parquet(self, out_file):
+        '''
+        Writes the summary as a Parquet file. Needs pyarrow.
+        '''
+        import_pyarrow()
+        import pyarrow.parquet as pq
+        pq.write_table(self.to_arrow(), out_file)
+
+    def write_arrow(self, out_file):
+        '''
+        Writes the summary as an Arrow IPC (Feather v2) file. Needs
+        pyarrow.
+        '''
+        pa = import_pyarrow()
+        table = self.to_arrow()
+        with pa.OSFile(out_file, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    def write(self, out_file):
+        '''
+        Writes the summary in the format given by the file extension:
+        .csv, .parquet, or .arrow/.feather.
+        '''
+        suffix = os.path.splitext(out_file)[1].lower()
+        if suffix == '.csv':
+            self.write_csv(out_file)
+        elif suffix == '.parquet':
+            self.write_parquet(out_file)
+        elif suffix in ('.arrow', '.feather'):
+            self.write_arrow(out_file)
+        else:
+            raise ValueError(f'Unknown summary format {suffix!r}; use one of '
+                             + ', '.join(EXPORT_FORMATS))
+
+
+class SummaryWriter():
+    '''
+    Writes a summary that arrives in parts (Summary objects for
+    consecutive batches of plasmids) to one file, so the whole library
+    never has to be held at once. The format is chosen by the file
+    extension, as for Summary.write. CSV rows are written as they come;
+    Parquet gets a row group and Arrow IPC a record batch per part.
+    '''
+    def __init__(self, out_file):
+        self.out_file = out_file
+        self.suffix = os.path.splitext(out_file)[1].lower()
+        if self.suffix not in EXPORT_FORMATS:
+            raise ValueError(f'Unknown summary format {self.suffix!r}; use one of '
+                             + ', '.join(EXPORT_FORMATS))
+        self.rows = 0
+        self.file = None
+        self.writer = None
+        self.schema = None
+        if self.suffix == '.csv':
+            self.file = open(out_file, 'wt', encoding='utf-8', newline='')
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(COLUMNS)
+        else:
+            import_pyarrow()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, summary):
+        '''
+        Appends the rows of summary.
+        '''
+        self.rows += len(summary)
+        if self.suffix == '.csv':
+            self.writer.writerows(summary.rows())
+            return
+        if not len(summary):
+            return
+        table = summary.to_arrow()
+        if self.writer is None:
+            # The first part fixes the schema for the rest
+            self.schema = table.schema
+            if self.suffix == '.parquet':
+                import pyarrow.parquet as pq
+                self.writer = pq.ParquetWriter(self.out_file, self.schema)
+            else:
+                pa = import_pyarrow()
+                self.file = pa.OSFile(self.out_file, 'wb')
+                self.writer = pa.ipc.new_file(self.file, self.schema)
+        self.writer.write_table(table.cast(self.schema))
+
+    def close(self):
+        if self.suffix == '.csv':
+            self.file.close()
+        elif self.writer is None:
+            # Nothing was written; an empty library still gets a file
+            Summary([]).write(self.out_file)
+        else:
+            self.writer.close()
+            if self.file is not None:
+                self.file.close()
+
+
+def import_pyarrow():
+    '''
+    Returns the pyarrow module, which is only needed for Parquet and
+    Arrow output.
+    '''
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError('Parquet and Arrow export need pyarrow, from the export '
+                          'extra (uv sync --extra export, or pip install pyarrow); '
+                          'CSV export does not.') from None
+    return pyarrow
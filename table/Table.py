@@ -0,0 +1,171 @@
+import os
+import html
+import numpy as np
+
+# Rows per page
+PAGE_SIZE = 500
+# Columns shown, as in Manager.TABLE_COLUMNS
+PAGE_COLUMNS = ['plasmid', 'promoter', 'SSS', 'tag', 'kDa', 'pI', 'top hit', 'organism']
+# kDa colour scale of the great-tables table (Manager.build_table):
+# palette stops spread evenly from DOMAIN[0] to DOMAIN[1]
+PALETTE = [(0x66, 0x33, 0x99), (0xFF, 0xFF, 0xFF), (0xFF, 0xA5, 0x00)]
+DOMAIN = (116, 8)
+STYLESHEET = '''body { font-family: system-ui, sans-serif; margin: 2em; }
+h1 { font-size: 1.4em; }
+nav { margin: 1em 0; }
+nav a { margin: 0 0.5em; }
+table { border-collapse: collapse; }
+th, td { border-bottom: 1px solid #D3D3D3; padding: 4px 10px; text-align: left; }
+thead th { border-bottom: 2px solid #A8A8A8; }
+td.num { text-align: right; }
+td.tag { font-size: 22px; text-align: center; color: green; font-weight: bold; }
+td.gap { background: #F9E3D6; }
+td.cytoplasmic { background: lightblue; }
+'''
+
+
+def relative_luminance(rgb):
+    '''
+    Returns the WCAG relative luminance of each row of an array of
+    0-255 RGB colours.
+    '''
+    channel = rgb / 255
+    channel = np.where(channel <= 0.03928, channel / 12.92, ((channel + 0.055) / 1.055) ** 2.4)
+    return 0.2126 * channel[..., 0] + 0.7152 * channel[..., 1] + 0.0722 * channel[..., 2]
+
+
+def contrast(luminance, other):
+    '''
+    Returns the WCAG contrast ratio between two relative luminances.
+    '''
+    return (np.maximum(luminance, other) + 0.05) / (np.minimum(luminance, other) + 0.05)
+
+
+def kda_colours(kda):
+    '''
+    Returns (background, text) lists of hex colours for an array of
+    masses, worked out as great-tables data_color does for the kDa
+    column: palette stops spread evenly over DOMAIN, white for missing
+    masses and masses outside DOMAIN, and black or white text, whichever
+    has the higher WCAG contrast with the background.
+    '''
+    scaled = (kda - DOMAIN[0]) / (DOMAIN[1] - DOMAIN[0])
+    inside = (scaled >= 0) & (scaled <= 1)
+    scaled = np.where(inside, scaled, 0.0)
+    cutoffs = np.arange(len(PALETTE)) * (1 / (len(PALETTE) - 1))
+    palette = np.array(PALETTE, dtype=np.float64)
+    slopes = (palette[1:] - palette[:-1]) / (cutoffs[1:] - cutoffs[:-1])[:, None]
+    segment = np.searchsorted(cutoffs[:-1], scaled, side='right') - 1
+    rgb = np.rint(slopes[segment] * (scaled - cutoffs[segment])[:, None] + palette[segment])
+    rgb[~inside] = 255
+    backgrounds = ['#%02X%02X%02X' % tuple(colour) for colour in rgb.astype(np.intp).tolist()]
+    luminance = relative_luminance(rgb)
+    dark = contrast(luminance, relative_luminance(np.zeros(3)))
+    light = contrast(luminance, relative_luminance(np.full(3, 255.0)))
+    texts = np.where(dark > light, '#000000', '#FFFFFF')
+    return backgrounds, texts.tolist()
+
+
+def numbers(values):
+    '''
+    Returns values formatted with one decimal, or '' where missing.
+    '''
+    return ['' if value != value else f'{value:.1f}' for value in values.tolist()]
+
+
+def render_rows(summary):
+    '''
+    Returns the HTML of every table row. Styles are worked out per
+    column from masks over the whole summary rather than per cell.
+    '''
+    promoters = summary.values('promoter').tolist()
+    signals = summary.values('SSS').tolist()
+    kda = summary.values('kDa')
+    backgrounds, texts = kda_colours(kda)
+    promoter_cells = [f'<td class="gap">{value}</td>' if value == 'gap' else f'<td>{value}</td>'
+                      for value in promoters]
+    signal_cells = [f'<td class="cytoplasmic">{value}</td>' if value == 'cytoplasmic'
+                    else f'<td>{value}</td>' for value in signals]
+    tag_cells = np.where(summary.values('tag'), '<td class="tag">+</td>', '<td class="tag"></td>')
+    return [
+        f'<tr><th>{html.escape(plasmid)}</th>{promoter}{signal}{tag}'
+        f'<td class="num" style="background:{background};color:{text}">{mass}</td>'
+        f'<td class="num">{pI}</td><td>{html.escape(hit)}</td><td>{html.escape(organism)}</td></tr>'
+        for plasmid, promoter, signal, tag, background, text, mass, pI, hit, organism
+        in zip(summary.values('plasmid'), promoter_cells, signal_cells, tag_cells.tolist(),
+               backgrounds, texts, numbers(kda), numbers(summary.values('pI')),
+               summary.values('top hit'), summary.values('organism'))
+    ]
+
+
+def page_name(page):
+    return f'page-{page:05d}.html'
+
+
+def navigation(page, pages):
+    '''
+    Returns the links to the previous, first, last and next pages.
+    '''
+    links = []
+    if page > 1:
+        links.append(f'<a href="{page_name(1)}">first</a>')
+        links.append(f'<a href="{page_name(page - 1)}">previous</a>')
+    links.append(f'page {page} of {pages}')
+    if page < pages:
+        links.append(f'<a href="{page_name(page + 1)}">next</a>')
+        links.append(f'<a href="{page_name(pages)}">last</a>')
+    return '<nav>' + ' '.join(links) + ' <a href="index.html">all pages</a></nav>'
+
+
+def write_page(out_file, rows, page, pages, first_row, total):
+    '''
+    Writes one page of the table.
+    '''
+    header = ''.join(f'<th>{column}</th>' for column in PAGE_COLUMNS)
+    nav = navigation(page, pages)
+    with open(out_file, 'wt', encoding='utf-8') as page_file:
+        page_file.write(
+            '<!DOCTYPE html><html><head><meta charset="utf-8">'
+            f'<title>Expression Plasmids, page {page} of {pages}</title>'
+            '<link rel="stylesheet" href="table.css"></head><body>'
+            f'<h1>Expression Plasmids</h1><p>Rows {first_row + 1}-{first_row + len(rows)} of {total}</p>'
+            f'{nav}<table><thead><tr>{header}</tr></thead><tbody>\n')
+        page_file.write('\n'.join(rows))
+        page_file.write(f'\n</tbody></table>{nav}</body></html>\n')
+
+
+def write_pages(summary, out_dir, page_size=PAGE_SIZE):
+    '''
+    Writes the summary table as numbered HTML pages of page_size rows in
+    out_dir, with a shared stylesheet and an index of the pages, and
+    returns the path of the index. Each page is small and quick to
+    open whatever the size of the library.
+    '''
+    os.makedirs(out_dir, exist_ok=True)
+    rows = render_rows(summary)
+    plasmids = summary.values('plasmid')
+    pages = max(1, -(-len(rows) // page_size))
+    with open(os.path.join(out_dir, 'table.css'), 'wt', encoding='utf-8') as css_file:
+        css_file.write(STYLESHEET)
+    entries = []
+    for page in range(1, pages + 1):
+        first_row = (page - 1) * page_size
+        page_rows = rows[first_row:first_row + page_size]
+        write_page(os.path.join(out_dir, page_name(page)), page_rows, page, pages,
+                   first_row, len(rows))
+        if page_rows:
+            first, last = plasmids[first_row], plasmids[first_row + len(page_rows) - 1]
+            entries.append(f'<li><a href="{page_name(page)}">{html.escape(first)}'
+                           f' &ndash; {html.escape(last)}</a></li>')
+    # Pages left over from a larger library are removed
+    for file in os.listdir(out_dir):
+        if file.startswith('page-') and file.endswith('.html') and file > page_name(pages):
+            os.remove(os.path.join(out_dir, file))
+    index_file = os.path.join(out_dir, 'index.html')
+    with open(index_file, 'wt', encoding='utf-8') as index:
+        index.write('<!DOCTYPE html><html><head><meta charset="utf-8">'
+                    '<title>Expression Plasmids</title>'
+                    '<link rel="stylesheet" href="table.css"></head><body>'
+                    f'<h1>Expression Plasmids</h1><p>{len(rows)} plasmids on {pages} pages</p>'
+                    f'<ol>{"".join(entries)}</ol></body></html>\n')
+    return index_file
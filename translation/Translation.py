@@ -0,0 +1,115 @@
+import itertools
+import numpy as np
+
+# Standard genetic code. '*' is a stop codon.
+GENETIC_CODE = {'TTT': 'F', 'TTC': 'F', 'TTA': 'L', 'TTG': 'L',
+                'TCT': 'S', 'TCC': 'S', 'TCA': 'S', 'TCG': 'S',
+                'TAT': 'Y', 'TAC': 'Y', 'TAA': '*', 'TAG': '*',
+                'TGT': 'C', 'TGC': 'C', 'TGA': '*', 'TGG': 'W',
+                'CTT': 'L', 'CTC': 'L', 'CTA': 'L', 'CTG': 'L',
+                'CCT': 'P', 'CCC': 'P', 'CCA': 'P', 'CCG': 'P',
+                'CAT': 'H', 'CAC': 'H', 'CAA': 'Q', 'CAG': 'Q',
+                'CGT': 'R', 'CGC': 'R', 'CGA': 'R', 'CGG': 'R',
+                'ATT': 'I', 'ATC': 'I', 'ATA': 'I', 'ATG': 'M',
+                'ACT': 'T', 'ACC': 'T', 'ACA': 'T', 'ACG': 'T',
+                'AAT': 'N', 'AAC': 'N', 'AAA': 'K', 'AAG': 'K',
+                'AGT': 'S', 'AGC': 'S', 'AGA': 'R', 'AGG': 'R',
+                'GTT': 'V', 'GTC': 'V', 'GTA': 'V', 'GTG': 'V',
+                'GCT': 'A', 'GCC': 'A', 'GCA': 'A', 'GCG': 'A',
+                'GAT': 'D', 'GAC': 'D', 'GAA': 'E', 'GAG': 'E',
+                'GGT': 'G', 'GGC': 'G', 'GGA': 'G', 'GGG': 'G'
+                }
+
+# IUPAC nucleotide codes and the bases each one stands for
+IUPAC_CODES = {'A': 'A', 'C': 'C', 'G': 'G', 'T': 'T', 'U': 'T',
+               'R': 'AG', 'Y': 'CT', 'S': 'CG', 'W': 'AT',
+               'K': 'GT', 'M': 'AC', 'B': 'CGT', 'D': 'AGT',
+               'H': 'ACT', 'V': 'ACG', 'N': 'ACGT'}
+SYMBOLS = list(IUPAC_CODES)
+# Index given to any character that is not an IUPAC code
+INVALID = len(SYMBOLS)
+N_CLASSES = len(SYMBOLS) + 1
+UNKNOWN = 'X'
+
+
+def build_base_index():
+    '''
+    Returns a 256 entry array that maps an ASCII byte to the index of
+    its nucleotide symbol. Lower case is accepted.
+    '''
+    base_index = np.full(256, INVALID, dtype=np.intp)
+    for idx, symbol in enumerate(SYMBOLS):
+        base_index[ord(symbol)] = idx
+        base_index[ord(symbol.lower())] = idx
+    return base_index
+
+
+def build_codon_table():
+    '''
+    Returns an array with one amino acid byte for every codon of three
+    symbol indexes. An ambiguous codon translates to an amino acid only
+    when every codon it stands for gives the same amino acid (GCN is A,
+    TAR is a stop); otherwise, and for invalid characters, it is X.
+    '''
+    codon_table = np.full(N_CLASSES ** 3, ord(UNKNOWN), dtype=np.uint8)
+    for first, second, third in itertools.product(range(len(SYMBOLS)), repeat=3):
+        amino_acids = {GENETIC_CODE[''.join(codon)] for codon in itertools.product(
+            IUPAC_CODES[SYMBOLS[first]],
+            IUPAC_CODES[SYMBOLS[second]],
+            IUPAC_CODES[SYMBOLS[third]])}
+        if len(amino_acids) == 1:
+            index = (first * N_CLASSES + second) * N_CLASSES + third
+            codon_table[index] = ord(amino_acids.pop())
+    return codon_table
+
+
+BASE_INDEX = build_base_index()
+CODON_TABLE = build_codon_table()
+
+
+def codon_indexes(sequence):
+    '''
+    Returns an array with the codon table index of every complete codon
+    in sequence, reading from the first base.
+    '''
+    raw = np.frombuffer(sequence.encode('ascii', 'replace'), dtype=np.uint8)
+    bases = BASE_INDEX[raw[:len(raw) // 3 * 3]].reshape(-1, 3)
+    return (bases[:, 0] * N_CLASSES + bases[:, 1]) * N_CLASSES + bases[:, 2]
+
+
+def translate(sequence):
+    '''
+    Translates every complete codon in a DNA sequence and returns the
+    protein as a string. Stop codons are '*'; codons that cannot be
+    resolved are X. An incomplete final codon is ignored.
+    '''
+    return CODON_TABLE[codon_indexes(sequence)].tobytes().decode('ascii')
+
+
+def translate_to_stop(sequence):
+    '''
+    Translates a DNA sequence up to and including the first stop codon.
+    If there is no stop codon, the whole translation is returned.
+    '''
+    protein = translate(sequence)
+    stop = protein.find('*')
+    if stop == -1:
+        return protein
+    return protein[:stop + 1]
+
+
+def translate_many(sequences):
+    '''
+    Translates a list of DNA sequences in one pass over the codon table
+    and returns a list of protein strings, as translate() would.
+    '''
+    # Trim each sequence to whole codons so the frames stay aligned
+    trimmed = [sequence[:len(sequence) // 3 * 3] for sequence in sequences]
+    translated = translate(''.join(trimmed))
+    proteins = []
+    start = 0
+    for sequence in trimmed:
+        end = start + len(sequence) // 3
+        proteins.append(translated[start:end])
+        start = end
+    return proteins
@@ -0,0 +1,49 @@
+import os
+
+# Files whose changes trigger a re-analysis of their folder
+WATCHED_ENDINGS = ('fa', 'fasta', '_blast.xml')
+
+
+def folder_snapshot(folder_path):
+    '''
+    Returns a dict of file name -> (inode, mtime_ns, size) for the fasta
+    and blast results files in folder_path.
+    '''
+    files = {}
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            if entry.name.endswith(WATCHED_ENDINGS) and entry.is_file():
+                stat = entry.stat()
+                files[entry.name] = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+def take_snapshot(root_directory):
+    '''
+    Returns a dict of folder name -> folder_snapshot() for every
+    subfolder of root_directory. Folders removed while scanning are
+    left out.
+    '''
+    snapshot = {}
+    with os.scandir(root_directory) as entries:
+        folders = sorted(entry.name for entry in entries if entry.is_dir())
+    for folder in folders:
+        try:
+            snapshot[folder] = folder_snapshot(os.path.join(root_directory, folder))
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+    return snapshot
+
+
+def diff_snapshots(old, new):
+    '''
+    Compares two snapshots from take_snapshot() and returns sorted lists
+    of the added, changed and removed folders. A folder has changed if
+    any of its fasta or blast files was added, removed, replaced or
+    modified.
+    '''
+    added = sorted(folder for folder in new if folder not in old)
+    removed = sorted(folder for folder in old if folder not in new)
+    changed = sorted(folder for folder in new
+                     if folder in old and new[folder] != old[folder])
+    return added, changed, removed